@@ -40,6 +40,12 @@ def create_app(config_name="default"):
     app.register_blueprint(analytics_bp)
     logger.info("Blueprints registered successfully")
 
+    # Register CLI commands
+    from app.commands import markets_cli, routing_cli
+
+    app.cli.add_command(routing_cli)
+    app.cli.add_command(markets_cli)
+
     logger.info("Flask application created successfully")
     return app
 
@@ -0,0 +1,104 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import update
+
+from app import db
+from app.config import get_setting
+from app.models.market import Market
+from app.services.grid import market_grid
+from app.services.routing import (
+    OSRM_MAX_TABLE_DESTINATIONS,
+    build_distance_matrix,
+    create_matrix_client,
+)
+from app.logging import get_logger
+
+# Setup logging
+logger = get_logger(__name__)
+
+routing_cli = AppGroup("routing", help="Routing data maintenance commands.")
+markets_cli = AppGroup("markets", help="Market data maintenance commands.")
+
+
+@routing_cli.command("build-matrix")
+@click.option("--output", default=None, help="Matrix path without extension.")
+@click.option("--cell-size", type=float, default=None, help="Grid cell in degrees.")
+@click.option(
+    "--chunk",
+    type=click.IntRange(min=1),
+    default=OSRM_MAX_TABLE_DESTINATIONS,
+    show_default=True,
+    help="Markets per OSRM Table request (server --max-table-size minus one).",
+)
+@click.option("--retries", type=click.IntRange(min=0), default=2, show_default=True)
+def build_matrix(output, cell_size, chunk, retries):
+    """Precompute the grid-cell x market road distance matrix with OSRM"""
+    output = (
+        output
+        or get_setting("ROUTING_MATRIX_PATH")
+        or os.path.join(current_app.instance_path, "route_matrix")
+    )
+    cell_size = cell_size or get_setting("ROUTING_MATRIX_CELL_SIZE")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    markets = (
+        Market.query.filter_by(is_active=True)
+        .filter(Market.latitude.isnot(None), Market.longitude.isnot(None))
+        .order_by(Market.id)
+        .all()
+    )
+    if not markets:
+        click.echo("No active markets found")
+        return
+
+    click.echo(f"Building distance matrix for {len(markets)} markets...")
+    client = create_matrix_client()
+    try:
+        result = build_distance_matrix(
+            client, markets, output, cell_size, chunk=chunk, retries=retries
+        )
+    finally:
+        client.close()
+
+    click.echo(
+        f"Wrote {result['cells']} cells x {len(markets)} markets to {output}.npy"
+    )
+    if result["failed_requests"]:
+        raise click.ClickException(
+            f"{result['failed_requests']} OSRM table requests failed after "
+            f"{retries} retries; {result['unknown_distances']} distances are "
+            "unknown. Check OSRM and rebuild."
+        )
+    if result["unknown_distances"]:
+        click.echo(
+            f"Warning: {result['unknown_distances']} market distances are "
+            "unreachable and stored as unknown",
+            err=True,
+        )
+
+
+@markets_cli.command("backfill-grid")
+@click.option("--batch-size", type=int, default=1000, help="Rows per commit.")
+def backfill_grid(batch_size):
+    """Assign grid cells to markets, e.g. after changing GRID_CELL_DEGREES"""
+    grid = market_grid()
+    rows = db.session.query(
+        Market.id, Market.latitude, Market.longitude, Market.grid_cell
+    ).all()
+    changes = [
+        {"id": market_id, "grid_cell": cell}
+        for market_id, latitude, longitude, current in rows
+        if (cell := grid.cell(latitude, longitude)) != current
+    ]
+
+    for start in range(0, len(changes), batch_size):
+        db.session.execute(update(Market), changes[start : start + batch_size])
+        db.session.commit()
+    logger.info(f"Grid cells backfilled for {len(changes)} markets")
+    click.echo(
+        f"Updated {len(changes)} of {len(rows)} markets "
+        f"(cell size {grid.size} degrees)"
+    )
@@ -1 +1 @@
-from .config import config
+from .config import config, get_setting
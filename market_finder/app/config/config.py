@@ -1,6 +1,7 @@
 import os
 import pymysql
 from dotenv import load_dotenv
+from flask import current_app, has_app_context
 
 load_dotenv()
 
@@ -22,6 +23,59 @@ class Config:
     # run mysql, create database market_finder if it does not exist
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # OSRM routing service used to rank nearby markets
+    OSRM_BASE_URL = os.environ.get("OSRM_BASE_URL") or "http://router.project-osrm.org"
+    OSRM_TIMEOUT = float(os.environ.get("OSRM_TIMEOUT") or 3)  # seconds per request
+    OSRM_MAX_CONCURRENCY = int(os.environ.get("OSRM_MAX_CONCURRENCY") or 8)
+    OSRM_DEADLINE = float(os.environ.get("OSRM_DEADLINE") or 4)  # seconds per ranking
+    OSRM_RANKING_MODE = os.environ.get("OSRM_RANKING_MODE") or "table"  # or "route"
+    OSRM_BREAKER_FAILURES = int(os.environ.get("OSRM_BREAKER_FAILURES") or 3)
+    OSRM_BREAKER_COOLDOWN = float(os.environ.get("OSRM_BREAKER_COOLDOWN") or 30)
+    OSRM_LATENCY_BUDGET = float(os.environ.get("OSRM_LATENCY_BUDGET") or 1.5)
+
+    # Routing provider: "osrm", "haversine" or "matrix" (precomputed, offline)
+    ROUTING_PROVIDER = os.environ.get("ROUTING_PROVIDER") or "osrm"
+    ROUTING_MATRIX_PATH = os.environ.get("ROUTING_MATRIX_PATH")  # default: instance dir
+    ROUTING_MATRIX_CELL_SIZE = float(os.environ.get("ROUTING_MATRIX_CELL_SIZE") or 0.01)
+    ROUTING_MATRIX_TIMEOUT = float(os.environ.get("ROUTING_MATRIX_TIMEOUT") or 30)
+
+    # Route distance cache (origin rounded to N decimal degrees, ~110m at 3)
+    ROUTE_CACHE_PRECISION = int(os.environ.get("ROUTE_CACHE_PRECISION") or 3)
+    ROUTE_CACHE_TTL = float(os.environ.get("ROUTE_CACHE_TTL") or 86400)  # seconds
+    ROUTE_CACHE_MAXSIZE = int(os.environ.get("ROUTE_CACHE_MAXSIZE") or 50000)
+
+    # Persistent route distance store shared by workers (SQLite, instance dir)
+    ROUTE_STORE_ENABLED = os.environ.get("ROUTE_STORE_ENABLED", "").lower() == "true"
+    ROUTE_STORE_PATH = os.environ.get("ROUTE_STORE_PATH")  # default: instance dir
+    ROUTE_STORE_TTL = float(os.environ.get("ROUTE_STORE_TTL") or 30 * 86400)
+
+    # Nearest-market lookups: "index" (in-process KD-tree) or "database"
+    # (growing radius search, MySQL SPATIAL index when available)
+    NEAREST_BACKEND = os.environ.get("NEAREST_BACKEND") or "index"
+    NEAREST_START_RADIUS_KM = float(os.environ.get("NEAREST_START_RADIUS_KM") or 5)
+
+    # Grid cells stored per market (~5.5 km at 0.05); run
+    # `flask markets backfill-grid` after changing the cell size
+    GRID_CELL_DEGREES = float(os.environ.get("GRID_CELL_DEGREES") or 0.05)
+    GRID_MAX_RINGS = int(os.environ.get("GRID_MAX_RINGS") or 10)  # then widen
+    GRID_MAX_CELLS = int(os.environ.get("GRID_MAX_CELLS") or 441)  # per radius query
+
+    # Largest origin list accepted by POST /api/markets/nearby/batch
+    NEARBY_BATCH_MAX_ORIGINS = int(os.environ.get("NEARBY_BATCH_MAX_ORIGINS") or 10000)
+
+    # Wall-clock cap per GA run; the best solution so far is returned (0 = none)
+    GA_TIME_BUDGET_MS = int(os.environ.get("GA_TIME_BUDGET_MS") or 1500)
+
+    # GA run telemetry: one structured log record per sampled run
+    GA_TELEMETRY_SAMPLE_RATE = float(os.environ.get("GA_TELEMETRY_SAMPLE_RATE") or 1.0)
+    GA_TELEMETRY_DEBUG = os.environ.get("GA_TELEMETRY_DEBUG", "").lower() == "true"
+
+    # GA convergence plots (diagnostics only, rendered by a background worker)
+    GA_REPORTS_ENABLED = os.environ.get("GA_REPORTS_ENABLED", "").lower() == "true"
+    GA_REPORTS_DIR = os.environ.get("GA_REPORTS_DIR") or os.path.join(
+        "static", "results"
+    )
+
     @classmethod
     def create_database_if_not_exists(cls):
         """Create database if it doesn't exist"""
@@ -70,8 +124,22 @@ class ProductionConfig(Config):
     DEBUG = False
 
 
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    ROUTING_PROVIDER = "haversine"
+
+
+def get_setting(key):
+    """Read a setting from the active app config, falling back to Config defaults"""
+    if has_app_context():
+        return current_app.config.get(key, getattr(Config, key))
+    return getattr(Config, key)
+
+
 config = {
     "development": DevelopmentConfig,
     "production": ProductionConfig,
+    "testing": TestingConfig,
     "default": DevelopmentConfig,
 }
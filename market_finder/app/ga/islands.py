@@ -0,0 +1,220 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from deap import creator, tools
+
+from app.ga.market_finder import TOOLBOX, GAConfig, GAContext
+from app.services.market_snapshot import MarketSnapshot
+from app.logging import get_logger
+
+# Setup logging
+logger = get_logger(__name__)
+
+Genes = List[int]
+Evaluated = List[Tuple[Genes, Tuple[float, ...]]]  # (genes, fitness values)
+
+
+class SharedMarketArrays:
+    """Market arrays and a run's distance vector in one shared memory block
+
+    Layout: float64 rows (latitude, longitude, distance) followed by int64
+    rows (id, category code), each `count` long. Workers attach by name, so
+    the data is copied once per run instead of pickled into every task.
+    """
+
+    FLOAT_ROWS = 3
+    INT_ROWS = 2
+
+    def __init__(self, shm: SharedMemory, count: int):
+        self.shm = shm
+        self.count = count
+        floats = self.FLOAT_ROWS * count
+        self.floats = np.ndarray((self.FLOAT_ROWS, count), np.float64, shm.buf)
+        self.ints = np.ndarray(
+            (self.INT_ROWS, count), np.int64, shm.buf, offset=floats * 8
+        )
+
+    @classmethod
+    def create(cls, ctx: GAContext) -> "SharedMarketArrays":
+        """Copy a run's snapshot and distance vector into a new block"""
+        count = len(ctx.snapshot)
+        size = max((cls.FLOAT_ROWS + cls.INT_ROWS) * count * 8, 1)
+        arrays = cls(SharedMemory(create=True, size=size), count)
+        arrays.floats[0] = ctx.snapshot.latitudes
+        arrays.floats[1] = ctx.snapshot.longitudes
+        arrays.floats[2] = ctx.distance_vector
+        arrays.ints[0] = ctx.snapshot.ids
+        arrays.ints[1] = ctx.snapshot.categories
+        return arrays
+
+    @classmethod
+    def attach(cls, name: str, count: int) -> "SharedMarketArrays":
+        """Attach to a block created by another process"""
+        return cls(SharedMemory(name=name), count)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def context(
+        self,
+        target_lat: float,
+        target_lng: float,
+        target_count: Optional[int],
+        seed: int,
+        config: GAConfig,
+    ) -> GAContext:
+        """Build a GA context whose arrays are views of the shared block"""
+        snapshot = MarketSnapshot(
+            ids=self._read_only(self.ints[0]),
+            latitudes=self._read_only(self.floats[0]),
+            longitudes=self._read_only(self.floats[1]),
+            categories=self._read_only(self.ints[1]),
+            category_labels=(),
+            row_by_id={},
+        )
+        return GAContext(
+            target_lat,
+            target_lng,
+            snapshot,
+            target_count,
+            seed,
+            distance_vector=self._read_only(self.floats[2]),
+            config=config,
+        )
+
+    @staticmethod
+    def _read_only(array: np.ndarray) -> np.ndarray:
+        view = array.view()
+        view.setflags(write=False)
+        return view
+
+    def close(self):
+        """Release this process's mapping"""
+        self.floats = self.ints = None
+        self.shm.close()
+
+    def unlink(self):
+        """Close and free the block (creating process only)"""
+        self.close()
+        self.shm.unlink()
+
+
+@dataclass
+class IslandTask:
+    """One island's work for a migration interval, small enough to pickle"""
+
+    shm_name: str
+    market_count: int
+    target_lat: float
+    target_lng: float
+    target_count: Optional[int]
+    population: Evaluated
+    generations: int
+    seed: int
+    config: GAConfig
+    time_limit: Optional[float] = None  # seconds left in the run's budget
+
+
+def evolve_island(task: IslandTask) -> Tuple[Evaluated, Dict[str, int]]:
+    """Evolve one island for a number of generations (runs in a worker)
+
+    Returns the evaluated population and counters: evaluations, fitness
+    cache hits and lookups, and generations run (fewer than requested if
+    time ran out).
+    """
+    arrays = SharedMarketArrays.attach(task.shm_name, task.market_count)
+    try:
+        return _evolve(arrays, task)
+    finally:
+        arrays.close()
+
+
+def _evolve(
+    arrays: SharedMarketArrays, task: IslandTask
+) -> Tuple[Evaluated, Dict[str, int]]:
+    # Views of the shared block are released when this returns
+    ctx = arrays.context(
+        task.target_lat, task.target_lng, task.target_count, task.seed, task.config
+    )
+    deadline = None
+    if task.time_limit is not None:
+        deadline = time.perf_counter() + task.time_limit
+
+    population = to_individuals(task.population)
+    evaluations = generations = 0
+    while generations < task.generations:
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        population = ctx.vary(population)
+        evaluations += ctx.evaluate(population)
+        generations += 1
+    return from_individuals(population), {
+        "evaluations": evaluations,
+        "generations": generations,
+        "cache_hits": ctx.cache_hits,
+        "cache_lookups": ctx.cache_lookups,
+    }
+
+
+def to_individuals(evaluated: Evaluated) -> List:
+    """Rebuild DEAP individuals from (genes, fitness) pairs"""
+    population = []
+    for genes, values in evaluated:
+        individual = creator.Individual(genes)
+        if values:
+            individual.fitness.values = values
+        population.append(individual)
+    return population
+
+
+def from_individuals(population: List) -> Evaluated:
+    """Plain (genes, fitness) pairs for pickling between processes"""
+    return [(list(ind), tuple(ind.fitness.values)) for ind in population]
+
+
+def migrate(islands: List[List], migrants: int):
+    """Ring migration: copies of each island's best replace the next island's worst"""
+    if len(islands) < 2 or migrants < 1:
+        return
+
+    emigrants = [
+        [TOOLBOX.clone(ind) for ind in tools.selBest(island, migrants)]
+        for island in islands
+    ]
+    for source, incoming in enumerate(emigrants):
+        target = islands[(source + 1) % len(islands)]
+        worst = sorted(range(len(target)), key=lambda i: target[i].fitness)
+        for position, individual in zip(worst, incoming):
+            target[position] = individual
+
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+
+
+def get_island_pool(workers: int) -> ProcessPoolExecutor:
+    """Get the shared worker pool for a number of islands
+
+    Runs may use different GAConfig.ISLANDS, so one pool is kept per worker
+    count, created on first use.
+    """
+    pool = _pools.get(workers)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(workers)
+            if pool is None:
+                # Spawned workers do not inherit the parent's threads or locks
+                pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                _pools[workers] = pool
+                logger.info(f"GA island pool started with {workers} workers")
+    return pool
@@ -1,24 +1,35 @@
+import json
+from collections import OrderedDict
 import random
 import math
+import time
 import numpy as np
 from typing import List, Dict, Any, Tuple, Optional
-from dataclasses import dataclass
-from deap import base, creator, tools, algorithms
-from app.models.market import Market
+from dataclasses import asdict, dataclass, field, fields, replace
+from deap import base, creator, tools
+from app.services.distance import DistanceKernel
+from app.services.market import MarketService
+from app.services.market_snapshot import MarketSnapshot, get_market_snapshot
+from app.services.routing import get_routing_provider
+from app.services.spatial_index import market_index
+from app.config import get_setting
+from app.ga.reports import submit_convergence_report
 from app.logging import get_logger
-import requests
 
-# matplotlib
-import matplotlib.pyplot as plt
-
-# use terminal backend for matplotlib
-plt.switch_backend("Agg")
 logger = get_logger(__name__)
 
+# Objectives whose fitness is a sum of per-market terms; their optimum is simply
+# the k closest markets, so they are solved exactly without running the GA.
+SEPARABLE_OBJECTIVES = {"distance"}
+
 
 @dataclass
 class GAConfig:
-    """Simplified GA configuration"""
+    """Simplified GA configuration
+
+    Class attributes are the process-wide defaults; each run uses its own
+    instance (see `from_settings` and `sized_for`).
+    """
 
     POPULATION_SIZE: int = 100
     GENERATIONS: int = 100
@@ -26,6 +37,48 @@ class GAConfig:
     MUTATION_PROB: float = 0.3
     TOURNAMENT_SIZE: int = 3
     ELITE_SIZE: int = 3
+    VECTORIZED_EVALUATION: bool = True
+    OBJECTIVE: str = "distance"  # "distance" or "category_mix"
+    CATEGORY_PENALTY: float = 5.0  # km added per repeated category (category_mix)
+    # "index_set": individuals hold the k selected market rows
+    # "bitlist": individuals hold one 0/1 gene per market in the catalogue
+    CHROMOSOME: str = "index_set"
+    # Island model: >1 runs sub-populations in worker processes
+    ISLANDS: int = 1
+    MIGRATION_INTERVAL: int = 10  # generations between migrations
+    MIGRANTS: int = 2  # elites sent to the next island per migration
+    # Scale population and generations to the catalogue and k, using
+    # POPULATION_SIZE and GENERATIONS as upper bounds
+    ADAPTIVE_SIZING: bool = True
+    MIN_POPULATION_SIZE: int = 20
+    MIN_GENERATIONS: int = 20
+    STAGNATION_LIMIT: int = 10  # generations without improvement before stopping
+    TIME_BUDGET_MS: Optional[int] = None  # wall-clock cap per run (GA_TIME_BUDGET_MS)
+    FITNESS_CACHE_SIZE: int = 4096  # memoised fitness values per run
+
+    @classmethod
+    def from_settings(cls) -> "GAConfig":
+        """Build a config from the class defaults and the app settings"""
+        values = {f.name: getattr(cls, f.name) for f in fields(cls)}
+        if values["TIME_BUDGET_MS"] is None:
+            values["TIME_BUDGET_MS"] = get_setting("GA_TIME_BUDGET_MS") or None
+        return cls(**values)
+
+    def sized_for(self, market_count: int, target_count: Optional[int]) -> "GAConfig":
+        """Copy with population and generations scaled to the search space"""
+        if not self.ADAPTIVE_SIZING:
+            return self
+
+        k = target_count or 3
+        population = int(2 * k * math.sqrt(market_count))
+        generations = int(10 * math.log2(max(market_count, 2)))
+        return replace(
+            self,
+            POPULATION_SIZE=min(
+                max(population, self.MIN_POPULATION_SIZE), self.POPULATION_SIZE
+            ),
+            GENERATIONS=min(max(generations, self.MIN_GENERATIONS), self.GENERATIONS),
+        )
 
 
 @dataclass
@@ -41,68 +94,410 @@ class GAStats:
     stagnation_count: int
 
 
-class MarketGA:
-    """Compact GA service to find nearest markets with convergence tracking"""
-
-    def __init__(self, target_lat: float, target_lng: float):
+@dataclass
+class GATelemetry:
+    """Structured record of one GA run, emitted as a single log line"""
+
+    markets: int
+    target_count: Optional[int]
+    population_size: int
+    islands: int = 1
+    generations: int = 0
+    evaluations: int = 0
+    fitness_cache_hits: int = 0
+    fitness_cache_lookups: int = 0
+    early_stop: bool = False
+    budget_exhausted: bool = False
+    time_budget_ms: Optional[int] = None
+    initial_best_fitness: Optional[float] = None
+    final_best_fitness: Optional[float] = None
+    final_diversity: Optional[float] = None
+    phase_seconds: Dict[str, float] = field(default_factory=dict)
+    generation_detail: Optional[List[Dict[str, Any]]] = None  # Debug mode only
+
+    def add_time(self, phase: str, started: float) -> float:
+        """Add time since `started` to a phase and return the current time"""
+        now = time.perf_counter()
+        self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + now - started
+        return now
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a JSON-serialisable dict"""
+        data = asdict(self)
+        data["phase_seconds"] = {
+            phase: round(seconds, 6) for phase, seconds in self.phase_seconds.items()
+        }
+        data["fitness_cache_hit_rate"] = (
+            round(self.fitness_cache_hits / self.fitness_cache_lookups, 4)
+            if self.fitness_cache_lookups
+            else 0.0
+        )
+        if data["generation_detail"] is None:
+            del data["generation_detail"]
+        return data
+
+
+def emit_telemetry(telemetry: GATelemetry):
+    """Log a run's telemetry as one record, subject to the sampling rate"""
+    debug = get_setting("GA_TELEMETRY_DEBUG")
+    if not debug and random.random() >= get_setting("GA_TELEMETRY_SAMPLE_RATE"):
+        return
+    logger.info(f"GA telemetry: {json.dumps(telemetry.to_dict(), default=float)}")
+
+
+class GAContext:
+    """Per-run GA state: config, target, snapshot, precomputed vectors and RNG
+
+    The shared toolbox operators take a context as their first argument, so
+    concurrent runs in the same process never share mutable state.
+    """
+
+    def __init__(
+        self,
+        target_lat: float,
+        target_lng: float,
+        snapshot: MarketSnapshot,
+        target_count: Optional[int] = None,
+        seed: Optional[int] = None,
+        distance_vector: Optional[np.ndarray] = None,
+        config: Optional[GAConfig] = None,
+    ):
+        self.config = config or GAConfig.from_settings()
         self.target_lat = target_lat
         self.target_lng = target_lng
-        self.markets = []
-        self.toolbox = None
-        self._distance_cache = {}
-        self.target_count = None  # Will be set when running GA
+        self.snapshot = snapshot  # Shared, read-only
+        self.target_count = target_count
+        self.rng = random.Random(seed)
+        self.fitness_cache: "OrderedDict[frozenset, Tuple[float]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_lookups = 0
+        if distance_vector is None:
+            distance_vector = self._build_distance_vector()
+        self.distance_vector = distance_vector
+        self.category_vector = snapshot.categories
+
+    def _build_distance_vector(self) -> np.ndarray:
+        """Compute Haversine distance from target to every market in one pass"""
+        return self.snapshot.kernel.distances_from(self.target_lat, self.target_lng)
+
+    def create_population(self, size: int) -> List[List[int]]:
+        """Create a random population"""
+        return [self.create_individual() for _ in range(size)]
+
+    def evaluate(self, population: List) -> int:
+        """Assign fitness to individuals without a valid one
+
+        Fitness is memoised per selected-market set, so unchanged clones and
+        duplicates are not recomputed. Returns the number of evaluations.
+        """
+        pending: Dict[frozenset, List] = {}
+        for ind in population:
+            if ind.fitness.valid:
+                continue
+            key = frozenset(self.selected_indices(ind))
+            self.cache_lookups += 1
+            cached = self.fitness_cache.get(key)
+            if cached is not None:
+                self.fitness_cache.move_to_end(key)
+                self.cache_hits += 1
+                ind.fitness.values = cached
+            else:
+                pending.setdefault(key, []).append(ind)
 
-        # Tracking variables
-        self.stats_history = []
-        self.best_fitness_history = []
-        self.avg_fitness_history = []
-        self.diversity_history = []
-        self.stagnation_count = 0
-        self.last_best_fitness = float("inf")
+        if not pending:
+            return 0
 
-        self._setup_deap()
+        # Evaluate one representative per distinct selection
+        representatives = [inds[0] for inds in pending.values()]
+        if self.config.VECTORIZED_EVALUATION:
+            fitnesses = TOOLBOX.evaluate_population(self, representatives)
+        else:
+            fitnesses = [TOOLBOX.evaluate(self, ind) for ind in representatives]
 
-    def _setup_deap(self):
-        """Setup DEAP toolbox"""
-        try:
-            if hasattr(creator, "FitnessMin"):
-                del creator.FitnessMin
-            if hasattr(creator, "Individual"):
-                del creator.Individual
-        except Exception:
-            pass
+        for (key, inds), fit in zip(pending.items(), fitnesses):
+            for ind in inds:
+                ind.fitness.values = fit
+            self.fitness_cache[key] = fit
+        while len(self.fitness_cache) > self.config.FITNESS_CACHE_SIZE:
+            self.fitness_cache.popitem(last=False)
+        return len(representatives)
+
+    def vary(self, population: List) -> List:
+        """Breed the next generation by selection, crossover and mutation"""
+        offspring = TOOLBOX.select(self, population, len(population))
+        offspring = list(map(TOOLBOX.clone, offspring))
+
+        # Apply crossover
+        for child1, child2 in zip(offspring[::2], offspring[1::2]):
+            if self.rng.random() < self.config.CROSSOVER_PROB:
+                TOOLBOX.mate(self, child1, child2)
+                del child1.fitness.values
+                del child2.fitness.values
+
+        # Apply mutation
+        for mutant in offspring:
+            if self.rng.random() < self.config.MUTATION_PROB:
+                TOOLBOX.mutate(self, mutant)
+                del mutant.fitness.values
+
+        return offspring
+
+    def select(self, individuals: List, k: int) -> List:
+        """Tournament selection drawing from this run's RNG"""
+        chosen = []
+        for _ in range(k):
+            aspirants = [
+                self.rng.choice(individuals) for _ in range(self.config.TOURNAMENT_SIZE)
+            ]
+            chosen.append(max(aspirants, key=lambda ind: ind.fitness))
+        return chosen
+
+    def calculate_diversity(self, population: List[List[int]]) -> float:
+        """Calculate population diversity using mean pairwise Hamming distance
+
+        At each position with c ones among P individuals, c * (P - c) pairs
+        differ, so the sum over all pairs is linear in population size.
+        """
+        if len(population) < 2:
+            return 0.0
+
+        size = len(population)
+        if self.config.CHROMOSOME == "index_set":
+            length = len(self.snapshot)
+            selected = np.concatenate(
+                [np.asarray(ind, dtype=np.int64) for ind in population]
+            )
+            ones = np.bincount(selected, minlength=length)
+        else:
+            ones = np.asarray(population, dtype=np.int64).sum(axis=0)
+            length = len(ones)
+        total_distance = float((ones * (size - ones)).sum())
+
+        # Normalize by maximum possible distance and number of comparisons
+        comparisons = size * (size - 1) / 2
+        return total_distance / comparisons / length
+
+    def selected_indices(self, individual: List[int]) -> List[int]:
+        """Market rows selected by an individual in either chromosome encoding"""
+        if self.config.CHROMOSOME == "index_set":
+            return list(individual)
+        return [i for i, val in enumerate(individual) if val == 1]
+
+    def create_individual(self) -> List[int]:
+        """Create random individual (selected market rows or binary representation)"""
+        market_count = len(self.snapshot)
+
+        # Use target_count if set, otherwise select 2-5 markets randomly
+        if self.target_count:
+            num_select = min(self.target_count, market_count)
+        else:
+            num_select = self.rng.randint(2, min(5, market_count))
+
+        selected_indices = self.rng.sample(range(market_count), num_select)
+        if self.config.CHROMOSOME == "index_set":
+            return creator.Individual(sorted(selected_indices))
+
+        individual = [0] * market_count
+        for idx in selected_indices:
+            individual[idx] = 1
+        return creator.Individual(individual)
+
+    def evaluate_individual(self, individual: List[int]) -> Tuple[float]:
+        """Evaluate individual fitness based on average Haversine distance and count penalty"""
+        selected_indices = self.selected_indices(individual)
+
+        if not selected_indices:
+            return (float("inf"),)
+
+        # Average Haversine distance, read from the precomputed vector
+        distances = [float(self.distance_vector[idx]) for idx in selected_indices]
+        avg_distance = sum(distances) / len(distances)
+
+        # Add penalty for not matching target count
+        count_penalty = 0
+        if self.target_count:
+            count_diff = abs(len(selected_indices) - self.target_count)
+            count_penalty = count_diff * 100.0  # Heavy penalty for wrong count
+
+        # Penalise repeated categories when a category mix is requested
+        category_penalty = 0
+        if self.config.OBJECTIVE == "category_mix":
+            categories = [self.category_vector[idx] for idx in selected_indices]
+            repeats = len(categories) - len(set(categories))
+            category_penalty = repeats * self.config.CATEGORY_PENALTY
+
+        return (avg_distance + count_penalty + category_penalty,)
+
+    def evaluate_population(self, population: List[List[int]]) -> List[Tuple[float]]:
+        """Evaluate whole population as a (population x markets) matrix product"""
+        if not population:
+            return []
+
+        if self.config.CHROMOSOME == "index_set":
+            return self._evaluate_index_sets(population)
 
+        selection = np.asarray(population, dtype=np.float64)
+        counts = selection.sum(axis=1)
+        totals = selection @ self.distance_vector
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fitness = np.where(counts > 0, totals / counts, np.inf)
+
+        # Add penalty for not matching target count
+        if self.target_count:
+            fitness = fitness + np.abs(counts - self.target_count) * 100.0
+
+        # Penalise repeated categories when a category mix is requested
+        if self.config.OBJECTIVE == "category_mix":
+            one_hot = np.eye(self.category_vector.max() + 1)[self.category_vector]
+            per_category = selection @ one_hot
+            repeats = np.clip(per_category - 1, 0, None).sum(axis=1)
+            fitness = fitness + repeats * self.config.CATEGORY_PENALTY
+
+        return [(float(value),) for value in fitness]
+
+    def _evaluate_index_sets(self, population: List[List[int]]) -> List[Tuple[float]]:
+        """Evaluate index-set individuals with a (population x k) gather"""
+        fitness = np.full(len(population), np.inf)
+        lengths = np.array([len(ind) for ind in population])
+
+        # Individuals of equal length are gathered together (normally all of them)
+        for length in np.unique(lengths[lengths > 0]):
+            rows = np.flatnonzero(lengths == length)
+            selected = np.array([population[row] for row in rows], dtype=np.int64)
+            values = self.distance_vector[selected].mean(axis=1)
+
+            # Add penalty for not matching target count
+            if self.target_count:
+                values = values + abs(length - self.target_count) * 100.0
+
+            # Penalise repeated categories when a category mix is requested
+            if self.config.OBJECTIVE == "category_mix":
+                categories = np.sort(self.category_vector[selected], axis=1)
+                repeats = (categories[:, 1:] == categories[:, :-1]).sum(axis=1)
+                values = values + repeats * self.config.CATEGORY_PENALTY
+
+            fitness[rows] = values
+
+        return [(float(value),) for value in fitness]
+
+    def mutate_individual(self, individual: List[int]) -> Tuple[List[int]]:
+        """Mutate individual by flipping bits while maintaining target count"""
+        if self.config.CHROMOSOME == "index_set":
+            return self._mutate_index_set(individual)
+
+        for _ in range(self.rng.randint(1, 3)):  # Perform 1-3 bit flips
+            # Choose a 1 to flip to 0
+            ones = [i for i, val in enumerate(individual) if val == 1]
+            zeros = [i for i, val in enumerate(individual) if val == 0]
+            if ones and zeros:
+                flip_off = self.rng.choice(ones)
+                flip_on = self.rng.choice(zeros)
+                individual[flip_off] = 0
+                individual[flip_on] = 1
+
+        # Ensure exactly target_count markets are selected
+        if self.target_count:
+            while sum(individual) > self.target_count:
+                ones = [i for i, val in enumerate(individual) if val == 1]
+                if ones:
+                    individual[self.rng.choice(ones)] = 0
+            while sum(individual) < self.target_count:
+                zeros = [i for i, val in enumerate(individual) if val == 0]
+                if zeros:
+                    individual[self.rng.choice(zeros)] = 1
+
+        return (individual,)
+
+    def _mutate_index_set(self, individual: List[int]) -> Tuple[List[int]]:
+        """Swap 1-3 selected markets for unselected ones, keeping the count"""
+        market_count = len(self.snapshot)
+        selected = set(individual)
+        if not selected or len(selected) >= market_count:
+            return (individual,)
+
+        for _ in range(self.rng.randint(1, 3)):
+            flip_on = self.rng.randrange(market_count)
+            while flip_on in selected:
+                flip_on = self.rng.randrange(market_count)
+            selected.remove(self.rng.choice(sorted(selected)))
+            selected.add(flip_on)
+
+        individual[:] = sorted(selected)
+        return (individual,)
+
+    def crossover(
+        self, parent1: List[int], parent2: List[int]
+    ) -> Tuple[List[int], List[int]]:
+        """Crossover in place: single point for bit lists, count-preserving for index sets"""
+        if self.config.CHROMOSOME == "index_set":
+            return self._crossover_index_sets(parent1, parent2)
+
+        if len(parent1) < 2:
+            return parent1, parent2
+
+        point = self.rng.randint(1, len(parent1) - 1)
+        parent1[point:], parent2[point:] = parent2[point:], parent1[point:]
+        return parent1, parent2
+
+    def _crossover_index_sets(
+        self, parent1: List[int], parent2: List[int]
+    ) -> Tuple[List[int], List[int]]:
+        """Children keep the shared markets and split the rest between them"""
+        shared = set(parent1) & set(parent2)
+        pool = sorted((set(parent1) | set(parent2)) - shared)
+        self.rng.shuffle(pool)
+
+        need1 = len(parent1) - len(shared)
+        parent1[:] = sorted(shared | set(pool[:need1]))
+        parent2[:] = sorted(shared | set(pool[need1:]))
+        return parent1, parent2
+
+
+def _build_toolbox() -> base.Toolbox:
+    """Create the DEAP types and shared toolbox once per process"""
+    if not hasattr(creator, "FitnessMin"):
         creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
+    if not hasattr(creator, "Individual"):
         creator.create("Individual", list, fitness=creator.FitnessMin)
 
-        self.toolbox = base.Toolbox()
-        self.toolbox.register("individual", self._create_individual)
-        self.toolbox.register("evaluate", self._evaluate_individual)
-        self.toolbox.register("mate", self._crossover)
-        self.toolbox.register("mutate", self._mutate_individual)
-        self.toolbox.register(
-            "select", tools.selTournament, tournsize=GAConfig.TOURNAMENT_SIZE
-        )
+    toolbox = base.Toolbox()
+    toolbox.register("individual", GAContext.create_individual)
+    toolbox.register("population", GAContext.create_population)
+    toolbox.register("evaluate", GAContext.evaluate_individual)
+    toolbox.register("evaluate_population", GAContext.evaluate_population)
+    toolbox.register("mate", GAContext.crossover)
+    toolbox.register("mutate", GAContext.mutate_individual)
+    toolbox.register("select", GAContext.select)
+    return toolbox
 
-    def _calculate_diversity(self, population: List[List[int]]) -> float:
-        """Calculate population diversity using Hamming distance"""
-        if len(population) < 2:
-            return 0.0
 
-        total_distance = 0
-        comparisons = 0
+# Operators are called as toolbox.<name>(context, ...)
+TOOLBOX = _build_toolbox()
 
-        for i in range(len(population)):
-            for j in range(i + 1, len(population)):
-                # Hamming distance between two individuals
-                hamming_dist = sum(a != b for a, b in zip(population[i], population[j]))
-                total_distance += hamming_dist
-                comparisons += 1
 
-        # Normalize by maximum possible distance and number of comparisons
-        max_distance = len(population[0])  # Maximum Hamming distance
-        avg_distance = total_distance / comparisons if comparisons > 0 else 0
-        return avg_distance / max_distance
+class MarketGA:
+    """Compact GA service to find nearest markets with convergence tracking"""
+
+    def __init__(
+        self, target_lat: float, target_lng: float, config: Optional[GAConfig] = None
+    ):
+        self.target_lat = target_lat
+        self.target_lng = target_lng
+        self.config = config or GAConfig.from_settings()
+        self.snapshot: Optional[MarketSnapshot] = None  # Shared, read-only
+        self.context: Optional[GAContext] = None  # Built per run
+        self.toolbox = TOOLBOX
+        self.report = None  # Future for the convergence plot, if enabled
+        self.telemetry: Optional["GATelemetry"] = None  # Set by each run
+
+        # Tracking variables
+        self.stats_history = []
+        self.best_fitness_history = []
+        self.avg_fitness_history = []
+        self.diversity_history = []
+        self.stagnation_count = 0
+        self.last_best_fitness = float("inf")
 
     def _collect_stats(self, population: List, generation: int) -> GAStats:
         """Collect statistics for current generation"""
@@ -128,7 +523,7 @@ class MarketGA:
         std_fitness = np.std(fitness_values)
 
         # Calculate diversity
-        diversity = self._calculate_diversity(population)
+        diversity = self.context.calculate_diversity(population)
 
         # Update stagnation count
         if (
@@ -149,143 +544,31 @@ class MarketGA:
             stagnation_count=self.stagnation_count,
         )
 
-    def _log_generation_stats(self, stats: GAStats):
-        """Log generation statistics"""
-        logger.info(f"Generation {stats.generation}:")
-        logger.info(f"  Best Fitness: {stats.best_fitness:.4f}")
-        logger.info(f"  Avg Fitness: {stats.avg_fitness:.4f}")
-        logger.info(f"  Worst Fitness: {stats.worst_fitness:.4f}")
-        logger.info(f"  Std Fitness: {stats.std_fitness:.4f}")
-        logger.info(f"  Diversity: {stats.diversity:.4f}")
-        logger.info(f"  Stagnation: {stats.stagnation_count} generations")
-
+    def _record_generation_stats(self, stats: GAStats):
+        """Record generation statistics in the run history"""
         # Store for history
         self.best_fitness_history.append(stats.best_fitness)
         self.avg_fitness_history.append(stats.avg_fitness)
         self.diversity_history.append(stats.diversity)
         self.stats_history.append(stats)
 
-    # @lru_cache(maxsize=256)
-    def _get_route_distance(
-        self, start: Tuple[float, float], end: Tuple[float, float]
-    ) -> Optional[float]:
-        """Get route distance from OSRM API"""
-        lng1, lat1 = start[1], start[0]
-        lng2, lat2 = end[1], end[0]
-        url = f"http://router.project-osrm.org/route/v1/driving/{lng1},{lat1};{lng2},{lat2}?overview=false"
-        try:
-            response = requests.get(url, timeout=3)
-            data = response.json()
-            return data["routes"][0]["distance"] / 1000  # km
-        except Exception:
-            return None
-
-    def _haversine_distance(
-        self, lat1: float, lng1: float, lat2: float, lng2: float
-    ) -> float:
-        """Calculate Haversine distance between two points"""
-        cache_key = (lat1, lng1, lat2, lng2)
-        if cache_key in self._distance_cache:
-            return self._distance_cache[cache_key]
-
-        lat1, lng1, lat2, lng2 = map(math.radians, [lat1, lng1, lat2, lng2])
-        dlat, dlng = lat2 - lat1, lng2 - lng1
-        a = (
-            math.sin(dlat / 2) ** 2
-            + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
+    def _select_top_k(self, limit: int) -> List[int]:
+        """Exact k nearest market ids by Haversine distance using a partial sort"""
+        distances = self.snapshot.kernel.distances_from(
+            self.target_lat, self.target_lng
         )
-        c = 2 * math.asin(math.sqrt(a))
-        distance = 6371 * c  # Earth radius in kilometers
-
-        self._distance_cache[cache_key] = distance
-        return distance
-
-    def _create_individual(self) -> List[int]:
-        """Create random individual (binary representation of selected markets)"""
-        individual = [0] * len(self.markets)
-
-        # Use self.target_count if set, otherwise select 2-5 markets randomly
-        if self.target_count:
-            num_select = min(self.target_count, len(self.markets))
+        if limit < len(distances):
+            candidates = np.argpartition(distances, limit - 1)[:limit]
         else:
-            num_select = random.randint(2, min(5, len(self.markets)))
+            candidates = np.arange(len(distances))
+        order = candidates[np.argsort(distances[candidates], kind="stable")]
+        return self.snapshot.ids_at(order)
 
-        selected_indices = random.sample(range(len(self.markets)), num_select)
-        for idx in selected_indices:
-            individual[idx] = 1
-        return creator.Individual(individual)
-
-    def _evaluate_individual(self, individual: List[int]) -> Tuple[float]:
-        """Evaluate individual fitness based on average Haversine distance and count penalty"""
-        selected_indices = [i for i, val in enumerate(individual) if val == 1]
-
-        if not selected_indices:
-            return (float("inf"),)
-
-        # Calculate average Haversine distance
-        distances = []
-        for idx in selected_indices:
-            market = self.markets[idx]
-            distance = self._haversine_distance(
-                self.target_lat, self.target_lng, market.latitude, market.longitude
-            )
-            if distance is None:  # Fallback to Haversine
-                distance = self._haversine_distance(
-                    self.target_lat, self.target_lng, market.latitude, market.longitude
-                )
-            distances.append(distance)
-
-        avg_distance = sum(distances) / len(distances)
-
-        # Add penalty for not matching target count
-        count_penalty = 0
-        if self.target_count:
-            count_diff = abs(len(selected_indices) - self.target_count)
-            count_penalty = count_diff * 100.0  # Heavy penalty for wrong count
-
-        return (avg_distance + count_penalty,)
-
-    def _mutate_individual(self, individual: List[int]) -> Tuple[List[int]]:
-        """Mutate individual by flipping bits while maintaining target count"""
-        current_count = sum(individual)
-        for _ in range(random.randint(1, 3)):  # Perform 1-3 bit flips
-            # Choose a 1 to flip to 0
-            ones = [i for i, val in enumerate(individual) if val == 1]
-            zeros = [i for i, val in enumerate(individual) if val == 0]
-            if ones and zeros:
-                flip_off = random.choice(ones)
-                flip_on = random.choice(zeros)
-                individual[flip_off] = 0
-                individual[flip_on] = 1
-
-        # Ensure exactly target_count markets are selected
-        if self.target_count:
-            while sum(individual) > self.target_count:
-                ones = [i for i, val in enumerate(individual) if val == 1]
-                if ones:
-                    individual[random.choice(ones)] = 0
-            while sum(individual) < self.target_count:
-                zeros = [i for i, val in enumerate(individual) if val == 0]
-                if zeros:
-                    individual[random.choice(zeros)] = 1
-
-        return (individual,)
-
-    def _crossover(
-        self, parent1: List[int], parent2: List[int]
-    ) -> Tuple[List[int], List[int]]:
-        """Single point crossover"""
-        if len(parent1) < 2:
-            return creator.Individual(parent1), creator.Individual(parent2)
-
-        point = random.randint(1, len(parent1) - 1)
-        child1 = creator.Individual(parent1[:point] + parent2[point:])
-        child2 = creator.Individual(parent2[:point] + parent1[point:])
-        return child1, child2
-
-    def _run_ga(self, target_count: Optional[int] = None) -> List[int]:
+    def _run_ga(
+        self, target_count: Optional[int] = None, seed: Optional[int] = None
+    ) -> List[int]:
         """Run genetic algorithm to find optimal market selection with detailed tracking"""
-        if not self.markets:
+        if self.snapshot is None or not len(self.snapshot):
             return []
 
         # Reset tracking variables
@@ -296,175 +579,183 @@ class MarketGA:
         self.stagnation_count = 0
         self.last_best_fitness = float("inf")
 
-        # Set target count for this run
-        self.target_count = target_count
+        # Per-run config sized to this catalogue and k
+        config = self.config.sized_for(len(self.snapshot), target_count)
 
-        # Register population
-        self.toolbox.register(
-            "population", tools.initRepeat, list, self.toolbox.individual
+        telemetry = self.telemetry = GATelemetry(
+            markets=len(self.snapshot),
+            target_count=target_count,
+            population_size=config.POPULATION_SIZE,
+            islands=max(config.ISLANDS, 1),
+            time_budget_ms=config.TIME_BUDGET_MS,
+        )
+        if get_setting("GA_TELEMETRY_DEBUG"):
+            telemetry.generation_detail = []
+        run_started = phase_started = time.perf_counter()
+        self._deadline = (
+            run_started + config.TIME_BUDGET_MS / 1000
+            if config.TIME_BUDGET_MS
+            else None
         )
 
-        # Initialize population
-        pop = self.toolbox.population(n=GAConfig.POPULATION_SIZE)
-        hof = tools.HallOfFame(GAConfig.ELITE_SIZE)
-
-        # Evaluate initial population
-        logger.info("=== STARTING GA WITH CONVERGENCE TRACKING ===")
-        logger.info(f"Population Size: {GAConfig.POPULATION_SIZE}")
-        logger.info(f"Max Generations: {GAConfig.GENERATIONS}")
-        logger.info(f"Target Markets: {target_count}")
-        logger.info("=" * 60)
-
-        # Custom evolution loop for better tracking
-        for gen in range(GAConfig.GENERATIONS):
-            # Evaluate population
-            fitnesses = list(map(self.toolbox.evaluate, pop))
-            for ind, fit in zip(pop, fitnesses):
-                ind.fitness.values = fit
-
-            # Collect and log statistics
-            stats = self._collect_stats(pop, gen)
-            self._log_generation_stats(stats)
-
-            # Update hall of fame
-            hof.update(pop)
-
-            # Check for early convergence
-            if self.stagnation_count >= 10:
-                logger.info(
-                    f"EARLY CONVERGENCE at generation {gen} (5 generations without improvement)"
-                )
-                break
-
-            # Selection
-            offspring = self.toolbox.select(pop, len(pop))
-            offspring = list(map(self.toolbox.clone, offspring))
-
-            # Apply crossover
-            for child1, child2 in zip(offspring[::2], offspring[1::2]):
-                if random.random() < GAConfig.CROSSOVER_PROB:
-                    self.toolbox.mate(child1, child2)
-                    del child1.fitness.values
-                    del child2.fitness.values
-
-            # Apply mutation
-            for mutant in offspring:
-                if random.random() < GAConfig.MUTATION_PROB:
-                    self.toolbox.mutate(mutant)
-                    del mutant.fitness.values
+        # Isolated state for this run
+        ctx = self.context = GAContext(
+            self.target_lat,
+            self.target_lng,
+            self.snapshot,
+            target_count,
+            seed,
+            config=config,
+        )
 
-            # Replace population
-            pop[:] = offspring
+        # Initialize population
+        pop = self.toolbox.population(ctx, config.POPULATION_SIZE)
+        hof = tools.HallOfFame(config.ELITE_SIZE)
+        phase_started = telemetry.add_time("initialization", phase_started)
 
-        # Final summary
-        logger.info("=" * 60)
-        logger.info("GA COMPLETED!")
+        if config.ISLANDS > 1:
+            self._evolve_islands(ctx, pop, hof)
+        else:
+            self._evolve_population(ctx, pop, hof)
 
         if self.stats_history:
-            initial_fitness = self.best_fitness_history[0]
-            final_fitness = self.best_fitness_history[-1]
-            improvement = (initial_fitness - final_fitness) / initial_fitness * 100
-
-            logger.info(f"CONVERGENCE SUMMARY:")
-            logger.info(f"   • Total Generations: {len(self.stats_history)}")
-            logger.info(f"   • Initial Best Fitness: {initial_fitness:.4f}")
-            logger.info(f"   • Final Best Fitness: {final_fitness:.4f}")
-            logger.info(f"   • Improvement: {improvement:.2f}%")
-            logger.info(f"   • Final Diversity: {self.diversity_history[-1]:.4f}")
-            logger.info(f"   • Final Stagnation: {self.stagnation_count} generations")
-
-            # Detect convergence point
-            convergence_gen = None
-            for i in range(1, len(self.best_fitness_history)):
-                if (
-                    abs(self.best_fitness_history[i] - self.best_fitness_history[i - 1])
-                    < 0.001
-                ):
-                    if i >= 2:
-                        stable_count = 1
-                        for j in range(
-                            i + 1, min(i + 3, len(self.best_fitness_history))
-                        ):
-                            if (
-                                abs(
-                                    self.best_fitness_history[j]
-                                    - self.best_fitness_history[i]
-                                )
-                                < 0.001
-                            ):
-                                stable_count += 1
-                        if stable_count >= 2:
-                            convergence_gen = i
-                            break
-
-            if convergence_gen:
-                logger.info(f"   • Converged at Generation: {convergence_gen}")
-                logger.info(f"   • Status: CONVERGED")
-            else:
-                logger.info(f"   • Status: NOT FULLY CONVERGED")
-
-            # Show fitness evolution
-            logger.info("FITNESS EVOLUTION:")
-            for i, fitness in enumerate(self.best_fitness_history):
-                diversity = self.diversity_history[i]
-                status = ""
-                if i > 0:
-                    change = fitness - self.best_fitness_history[i - 1]
-                    if abs(change) < 0.001:
-                        status = "🔄"
-                    elif change < 0:
-                        status = "⬇️"
-                    else:
-                        status = "⬆️"
-
-                logger.info(
-                    f"   Gen {i:2d}: Fitness={fitness:.4f}, Diversity={diversity:.3f}"
-                )
+            telemetry.initial_best_fitness = self.best_fitness_history[0]
+            telemetry.final_best_fitness = self.best_fitness_history[-1]
+            telemetry.final_diversity = self.diversity_history[-1]
 
-            # Plot fitness and diversity over generations
-            plt.figure(figsize=(10, 6))
-            plt.plot(
-                range(len(self.best_fitness_history)),
+            # Optional diagnostics, rendered off the request path
+            self.report = submit_convergence_report(
                 self.best_fitness_history,
-                label="Best Fitness",
-                color="blue",
-            )
-            plt.plot(
-                range(len(self.avg_fitness_history)),
                 self.avg_fitness_history,
-                label="Avg Fitness",
-                color="orange",
-            )
-            plt.xlabel("Generation")
-            plt.ylabel("Fitness")
-            plt.title("GA Fitness Over Generations")
-            plt.legend()
-            plt.grid(True)
-            plt.twinx()
-            plt.plot(
-                range(len(self.diversity_history)),
                 self.diversity_history,
-                label="Diversity",
-                color="green",
-                linestyle="--",
             )
-            plt.ylabel("Diversity")
-            plt.legend(loc="upper right")
-            # save to file
-            # create folder if not exists
-            import os
-            from pathlib import Path
-
-            static_dir = Path("static")
-            resultdit = static_dir / "results"
-            resultdit.mkdir(parents=True, exist_ok=True)
-            plt.savefig(resultdit / "ga_fitness_diversity.png")
-            plt.close()
 
-        logger.info("=" * 60)
+        telemetry.fitness_cache_hits += ctx.cache_hits
+        telemetry.fitness_cache_lookups += ctx.cache_lookups
+        telemetry.add_time("total", run_started)
+        emit_telemetry(telemetry)
 
         return hof[0] if hof else []
 
+    def _track_generation(self, pop: List, generation: int, hof, step: int = 1) -> bool:
+        """Record statistics every `step` generations; True once the run stagnated"""
+        stats = self._collect_stats(pop, generation)
+        self._record_generation_stats(stats)
+        if self.telemetry.generation_detail is not None:
+            self.telemetry.generation_detail.append(asdict(stats))
+        hof.update(pop)
+        self.telemetry.generations = generation + 1
+        return self.stagnation_count * step >= self.context.config.STAGNATION_LIMIT
+
+    def _remaining_budget(self) -> Optional[float]:
+        """Seconds left in this run's time budget, or None if unlimited"""
+        if self._deadline is None:
+            return None
+        return self._deadline - time.perf_counter()
+
+    def _evolve_population(self, ctx: GAContext, pop: List, hof):
+        """Single-population evolution loop in this process"""
+        config = ctx.config
+        telemetry = self.telemetry
+        phase_started = time.perf_counter()
+        for gen in range(config.GENERATIONS):
+            # Evaluate population
+            telemetry.evaluations += ctx.evaluate(pop)
+            phase_started = telemetry.add_time("evaluation", phase_started)
+
+            # Collect statistics, update hall of fame, check for early convergence
+            stagnated = self._track_generation(pop, gen, hof)
+            phase_started = telemetry.add_time("statistics", phase_started)
+            if stagnated:
+                telemetry.early_stop = True
+                break
+
+            # Out of time: return the hall-of-fame best found so far
+            remaining = self._remaining_budget()
+            if remaining is not None and remaining <= 0:
+                telemetry.budget_exhausted = True
+                break
+
+            # Selection, crossover and mutation
+            pop[:] = ctx.vary(pop)
+            phase_started = telemetry.add_time("variation", phase_started)
+
+    def _evolve_islands(self, ctx: GAContext, pop: List, hof):
+        """Island model: sub-populations evolve in worker processes and
+        exchange elites every MIGRATION_INTERVAL generations
+        """
+        from app.ga.islands import (
+            IslandTask,
+            SharedMarketArrays,
+            evolve_island,
+            from_individuals,
+            get_island_pool,
+            migrate,
+            to_individuals,
+        )
+
+        config = ctx.config
+        telemetry = self.telemetry
+        phase_started = time.perf_counter()
+        telemetry.evaluations += ctx.evaluate(pop)
+        islands = [pop[i :: config.ISLANDS] for i in range(config.ISLANDS)]
+        stagnated = self._track_generation(pop, 0, hof)
+        phase_started = telemetry.add_time("evaluation", phase_started)
+
+        arrays = SharedMarketArrays.create(ctx)
+        try:
+            pool = get_island_pool(config.ISLANDS)
+            generation = 1
+            while generation < config.GENERATIONS and not stagnated:
+                # Out of time: return the hall-of-fame best found so far
+                remaining = self._remaining_budget()
+                if remaining is not None and remaining <= 0:
+                    telemetry.budget_exhausted = True
+                    break
+
+                interval = min(
+                    config.MIGRATION_INTERVAL, config.GENERATIONS - generation
+                )
+                futures = [
+                    pool.submit(
+                        evolve_island,
+                        IslandTask(
+                            shm_name=arrays.name,
+                            market_count=arrays.count,
+                            target_lat=ctx.target_lat,
+                            target_lng=ctx.target_lng,
+                            target_count=ctx.target_count,
+                            population=from_individuals(island),
+                            generations=interval,
+                            seed=ctx.rng.randrange(2**32),
+                            config=config,
+                            time_limit=remaining,
+                        ),
+                    )
+                    for island in islands
+                ]
+                islands, completed = [], 0
+                for future in futures:
+                    evaluated, counts = future.result()
+                    islands.append(to_individuals(evaluated))
+                    telemetry.evaluations += counts["evaluations"]
+                    telemetry.fitness_cache_hits += counts["cache_hits"]
+                    telemetry.fitness_cache_lookups += counts["cache_lookups"]
+                    completed = max(completed, counts["generations"])
+                generation += completed
+                phase_started = telemetry.add_time("evolution", phase_started)
+
+                migrate(islands, config.MIGRANTS)
+                pop[:] = [ind for island in islands for ind in island]
+                stagnated = self._track_generation(
+                    pop, generation - 1, hof, step=max(completed, 1)
+                )
+                phase_started = telemetry.add_time("statistics", phase_started)
+        finally:
+            arrays.unlink()
+
+        telemetry.early_stop = stagnated
+
     def get_convergence_summary(self) -> Dict[str, Any]:
         """Get summary of convergence statistics"""
         if not self.stats_history:
@@ -521,80 +812,102 @@ class MarketGA:
             f"Finding {limit} nearest markets to ({self.target_lat}, {self.target_lng})"
         )
 
-        # Load all active markets
-        self.markets = (
-            Market.query.filter_by(is_active=True)
-            .filter(Market.latitude.isnot(None), Market.longitude.isnot(None))
-            .all()
-        )
+        # Separable objective: the optimum is exactly the k closest markets,
+        # answered by the spatial index or the database without loading the
+        # whole table
+        if self.config.OBJECTIVE in SEPARABLE_OBJECTIVES:
+            if get_setting("NEAREST_BACKEND") == "database":
+                selected_markets = [
+                    market
+                    for _, market in MarketService.get_nearest_markets(
+                        self.target_lat, self.target_lng, limit
+                    )
+                ]
+            else:
+                nearest = market_index.nearest(self.target_lat, self.target_lng, limit)
+                selected_markets = MarketService.get_markets_by_ids(
+                    [market_id for market_id, _ in nearest]
+                )
+            if not selected_markets:
+                logger.warning("No active markets found")
+                return []
+
+            logger.info(f"Selected {len(selected_markets)} markets from spatial index")
+            return self._rank_with_osrm(selected_markets, limit)
 
-        if not self.markets:
+        # Use the shared column-only snapshot of active markets
+        self.snapshot = get_market_snapshot()
+
+        if not len(self.snapshot):
             logger.warning("No active markets found")
             return []
 
-        logger.info(f"Found {len(self.markets)} active markets")
-        # for market in self.markets:
-        #     logger.info(f"  - Market {market.id}: {market.name}")
+        logger.info(f"Found {len(self.snapshot)} active markets")
 
         # If markets <= limit, return all markets sorted by OSRM distance
-        if len(self.markets) <= limit:
+        if len(self.snapshot) <= limit:
             logger.info(
-                f"Markets count ({len(self.markets)}) <= limit ({limit}), returning all"
+                f"Markets count ({len(self.snapshot)}) <= limit ({limit}), returning all"
+            )
+            markets = MarketService.get_markets_by_ids(
+                self.snapshot.ids_at(range(len(self.snapshot)))
             )
-            return self._rank_with_osrm(self.markets, len(self.markets))
+            return self._rank_with_osrm(markets, len(markets))
 
         # Step 1: Use GA to find good subset with target count
-        random.seed(42)
-        np.random.seed(42)
-        best_individual = self._run_ga(target_count=limit)
+        best_individual = self._run_ga(target_count=limit, seed=42)
         logger.info(f"Best individual from GA: {best_individual}")
         logger.info(
-            f"Selected markets count: {sum(best_individual) if best_individual else 0}"
+            "Selected markets count: "
+            f"{len(self.context.selected_indices(best_individual)) if best_individual else 0}"
         )
 
         # Step 2: Get selected markets from GA result
         if best_individual:
             logger.info("Using selected markets from GA")
-            selected_indices = [i for i, v in enumerate(best_individual) if v == 1]
-            selected_markets = [self.markets[i] for i in selected_indices]
+            selected_indices = self.context.selected_indices(best_individual)
+            selected_ids = self.snapshot.ids_at(selected_indices)
 
         else:
             # Fallback: use closest markets by Haversine
             logger.info(
                 f"No selected markets from GA, using closest {limit} markets by Haversine"
             )
-            market_distances = []
-            for market in self.markets:
-                distance = self._haversine_distance(
-                    self.target_lat, self.target_lng, market.latitude, market.longitude
-                )
-                market_distances.append((market, distance))
-            market_distances.sort(key=lambda x: x[1])
-            selected_markets = [market for market, _ in market_distances[:limit]]
+            selected_ids = self._select_top_k(limit)
 
-        # Step 3: Final ranking with OSRM
+        # Step 3: Hydrate only the selected rows, then final ranking with OSRM
+        selected_markets = MarketService.get_markets_by_ids(selected_ids)
         return self._rank_with_osrm(selected_markets, limit)
 
     def _rank_with_osrm(self, markets: List, limit: int) -> List[Dict[str, Any]]:
-        """Rank markets using OSRM route distance"""
-        logger.info(f"Ranking {len(markets)} markets using OSRM")
+        """Rank markets using the configured routing provider (OSRM by default)"""
+        logger.info(
+            f"Ranking {len(markets)} markets using {get_routing_provider().name}"
+        )
         for market in markets:
             logger.info(f"  - Market {market.id}: {market.name}")
 
-        results = []
-        for market in markets:
-            # Try OSRM first
-            distance = self._get_route_distance(
-                (self.target_lat, self.target_lng), (market.latitude, market.longitude)
-            )
+        # Road distances from the configured routing provider
+        provider = get_routing_provider()
+        route_distances = list(
+            provider.distances((self.target_lat, self.target_lng), markets)
+        )
 
-            # Fallback to Haversine if OSRM fails
-            if distance is None:
-                distance = self._haversine_distance(
-                    self.target_lat, self.target_lng, market.latitude, market.longitude
+        # Fallback to Haversine, in one kernel pass, where the provider has none
+        failed = [i for i, distance in enumerate(route_distances) if distance is None]
+        if failed:
+            fallback = DistanceKernel.from_coordinates(
+                [markets[i].latitude for i in failed],
+                [markets[i].longitude for i in failed],
+            ).distances_from(self.target_lat, self.target_lng)
+            for i, distance in zip(failed, fallback.tolist()):
+                route_distances[i] = distance
+                logger.warning(
+                    f"Market {markets[i].id}: {provider.name} failed, using Haversine"
                 )
-                logger.warning(f"Market {market.id}: OSRM failed, using Haversine")
 
+        results = []
+        for market, distance in zip(markets, route_distances):
             results.append(
                 {
                     "market": market,
@@ -610,8 +923,11 @@ class MarketGA:
 
 
 def find_nearby_markets(
-    target_lat: float, target_lng: float, limit: int = 5
+    target_lat: float,
+    target_lng: float,
+    limit: int = 5,
+    config: Optional[GAConfig] = None,
 ) -> List[Dict[str, Any]]:
     """Convenience function to find nearby markets"""
-    ga = MarketGA(target_lat, target_lng)
+    ga = MarketGA(target_lat, target_lng, config)
     return ga.find_nearest_markets(limit)
@@ -0,0 +1,101 @@
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+
+from app.config import get_setting
+from app.logging import get_logger
+
+# Setup logging
+logger = get_logger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Get the single background worker that renders reports"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="ga-report"
+                )
+    return _executor
+
+
+def report_path(directory: str) -> str:
+    """Unique file name for one run's convergence plot"""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = f"ga_fitness_diversity_{stamp}_{uuid.uuid4().hex[:8]}.png"
+    return os.path.join(directory, name)
+
+
+def plot_convergence(
+    path: str,
+    best_fitness: List[float],
+    avg_fitness: List[float],
+    diversity: List[float],
+) -> str:
+    """Plot fitness and diversity over generations to a PNG file"""
+    # Imported here so nearby requests never pay for matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.plot(
+        range(len(best_fitness)), best_fitness, label="Best Fitness", color="blue"
+    )
+    axes.plot(range(len(avg_fitness)), avg_fitness, label="Avg Fitness", color="orange")
+    axes.set_xlabel("Generation")
+    axes.set_ylabel("Fitness")
+    axes.set_title("GA Fitness Over Generations")
+    axes.legend()
+    axes.grid(True)
+
+    diversity_axes = axes.twinx()
+    diversity_axes.plot(
+        range(len(diversity)),
+        diversity,
+        label="Diversity",
+        color="green",
+        linestyle="--",
+    )
+    diversity_axes.set_ylabel("Diversity")
+    diversity_axes.legend(loc="upper right")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    figure.savefig(path)
+    logger.info(f"GA convergence report written to {path}")
+    return path
+
+
+def submit_convergence_report(
+    best_fitness: List[float],
+    avg_fitness: List[float],
+    diversity: List[float],
+) -> Optional[Future]:
+    """Render a convergence plot in the background if reports are enabled
+
+    Returns a future resolving to the file path, or None when disabled.
+    """
+    if not get_setting("GA_REPORTS_ENABLED"):
+        return None
+
+    path = report_path(get_setting("GA_REPORTS_DIR"))
+    future = _get_executor().submit(
+        plot_convergence, path, list(best_fitness), list(avg_fitness), list(diversity)
+    )
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def _log_failure(future: Future):
+    error = future.exception()
+    if error is not None:
+        logger.error(f"GA convergence report failed: {str(error)}")
@@ -45,6 +45,9 @@ class MarketImage(db.Model):
 
 class Market(db.Model):
     __tablename__ = "markets"
+    __table_args__ = (
+        db.Index("ix_markets_active_location", "is_active", "latitude", "longitude"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -52,6 +55,7 @@ class Market(db.Model):
     location = db.Column(db.String(255), nullable=False)
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    grid_cell = db.Column(db.Integer, index=True)  # See app.services.grid
     category = db.Column(db.Enum(MarketCategory), default=MarketCategory.GENERAL)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -84,3 +88,18 @@ class Market(db.Model):
 
     def __repr__(self):
         return f"<Market {self.name}>"
+
+
+class CatalogueVersion(db.Model):
+    """Version counter bumped whenever the market catalogue changes"""
+
+    __tablename__ = "catalogue_versions"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    def __repr__(self):
+        return f"<CatalogueVersion {self.name}={self.version}>"
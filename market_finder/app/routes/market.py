@@ -1,6 +1,14 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import (
+    Blueprint,
+    Response,
+    request,
+    jsonify,
+    send_from_directory,
+    stream_with_context,
+)
 import json
 import os
+from app.config import get_setting
 from app.services.market import MarketService
 from app.utils.response import APIResponse, RequestValidator
 from app.utils.auth import admin_required, token_required
@@ -395,6 +403,68 @@ def find_nearby_marketss():
         return APIResponse.internal_error("Failed to find nearby markets")
 
 
+@market_bp.route("/nearby/batch", methods=["POST"])
+def find_nearby_markets_batch():
+    """Find nearest markets for many origins, streamed as JSON lines"""
+    logger.info("POST /api/markets/nearby/batch - Finding nearby markets in batch")
+
+    try:
+        data = request.get_json()
+
+        if not data:
+            logger.warning("No JSON data provided")
+            return APIResponse.bad_request("Request body is required")
+
+        origins = data.get("origins")
+        limit = data.get("limit", 3)
+        max_origins = get_setting("NEARBY_BATCH_MAX_ORIGINS")
+
+        if not isinstance(origins, list) or not origins:
+            return APIResponse.bad_request("origins must be a non-empty list")
+        if len(origins) > max_origins:
+            return APIResponse.bad_request(
+                f"At most {max_origins} origins are allowed per request"
+            )
+        if not isinstance(limit, int) or limit < 1 or limit > 50:
+            logger.warning(f"Invalid limit: {limit}")
+            return APIResponse.bad_request("Limit must be an integer between 1 and 50")
+
+        # Validate every origin before streaming starts
+        validation_errors = {}
+        for index, origin in enumerate(origins):
+            if not isinstance(origin, dict):
+                validation_errors[index] = ["Origin must be an object"]
+                continue
+            errors = RequestValidator.validate_coordinates(
+                origin.get("latitude"), origin.get("longitude")
+            )
+            if errors:
+                validation_errors[index] = errors
+        if validation_errors:
+            logger.warning(f"Invalid origins: {len(validation_errors)}")
+            return APIResponse.validation_error(validation_errors)
+
+        logger.info(f"Finding {limit} nearest markets for {len(origins)} origins")
+
+        from app.services.nearby import iter_nearest_markets
+
+        def generate():
+            try:
+                for result in iter_nearest_markets(origins, limit):
+                    yield json.dumps(result) + "\n"
+            except Exception as e:
+                logger.error(f"Error streaming nearby batch: {str(e)}", exc_info=True)
+                yield json.dumps({"error": "Failed to find nearby markets"}) + "\n"
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
+        )
+
+    except Exception as e:
+        logger.error(f"Error finding nearby markets batch: {str(e)}", exc_info=True)
+        return APIResponse.internal_error("Failed to find nearby markets")
+
+
 @market_bp.route("/images/<filename>", methods=["GET"])
 def serve_market_image(filename):
     """Serve market image files"""
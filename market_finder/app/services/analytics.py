@@ -7,6 +7,8 @@ from app.models.analytics import (
     MarketPopularity,
 )
 from app.models.market import Market
+from app.services.route_cache import get_route_cache
+from app.services.routing import get_osrm_client
 from app import db
 
 
@@ -193,6 +195,8 @@ class DashboardAnalyticsService:
             "db_status": db_status,
             "avg_response_time": "145ms",  # This could be calculated from actual metrics
             "error_rate": "0.2%",
+            "routing": get_osrm_client().breaker.snapshot(),
+            "route_cache": get_route_cache().stats(),
             "last_checked": datetime.utcnow().isoformat(),
         }
 
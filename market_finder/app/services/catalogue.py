@@ -0,0 +1,104 @@
+import threading
+from typing import Callable, Dict, List
+
+from flask import g, has_app_context, has_request_context
+from sqlalchemy import update
+
+from app import db
+from app.models.market import CatalogueVersion
+from app.logging import get_logger
+
+# Setup logging
+logger = get_logger(__name__)
+
+CATALOGUE_NAME = "markets"  # Active markets' positions and categories
+POSITIONS_NAME = "market_positions"  # Markets moved or deactivated
+
+_listeners: Dict[str, List[Callable[[], None]]] = {}
+_seen_versions: Dict[str, int] = {}  # Versions this worker's caches reflect
+_lock = threading.Lock()
+
+
+def on_catalogue_change(
+    listener: Callable[[], None], catalogue: str = CATALOGUE_NAME
+) -> Callable[[], None]:
+    """Register a callback that drops a cache when a catalogue changes"""
+    _listeners.setdefault(catalogue, []).append(listener)
+    return listener
+
+
+def bump_catalogue_version(*names: str) -> Dict[str, int]:
+    """Increment catalogue versions inside the current transaction
+
+    Call before committing a market change so the bump commits atomically with
+    it. Bumps CATALOGUE_NAME when no names are given. Returns the new versions.
+    """
+    names = names or (CATALOGUE_NAME,)
+    for name in names:
+        result = db.session.execute(
+            update(CatalogueVersion)
+            .where(CatalogueVersion.name == name)
+            .values(version=CatalogueVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            db.session.add(CatalogueVersion(name=name, version=1))
+    db.session.flush()
+
+    versions = _read_versions()
+    if has_request_context():
+        g.catalogue_versions = versions
+    return {name: versions[name] for name in names}
+
+
+def get_catalogue_versions() -> Dict[str, int]:
+    """Read all catalogue versions in one query, at most once per request"""
+    if has_request_context() and "catalogue_versions" in g:
+        return g.catalogue_versions
+
+    versions = _read_versions()
+    if has_request_context():
+        g.catalogue_versions = versions
+    return versions
+
+
+def _read_versions() -> Dict[str, int]:
+    rows = db.session.execute(
+        db.select(CatalogueVersion.name, CatalogueVersion.version)
+    ).all()
+    return {name: version for name, version in rows}
+
+
+def mark_catalogue_seen(versions: Dict[str, int]):
+    """Record versions this worker has applied locally (after its own write)
+
+    Each only advances when no other worker's change was missed in between.
+    """
+    with _lock:
+        for name, version in versions.items():
+            if name in _seen_versions and version == _seen_versions[name] + 1:
+                _seen_versions[name] = version
+
+
+def sync_catalogue():
+    """Drop registered caches for catalogues another worker changed"""
+    if not has_app_context():
+        return  # No database to check (e.g. offline tools and tests)
+
+    versions = get_catalogue_versions()
+    stale = []
+    with _lock:
+        for name in _listeners:
+            version = versions.get(name, 0)
+            if _seen_versions.get(name) == version:
+                continue
+            if name in _seen_versions:
+                stale.append(name)
+            _seen_versions[name] = version
+
+    for name in stale:
+        logger.info(
+            f"Catalogue {name} changed to version {versions.get(name, 0)}, "
+            "dropping caches"
+        )
+        for listener in _listeners[name]:
+            listener()
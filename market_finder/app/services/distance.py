@@ -0,0 +1,97 @@
+import math
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometers"""
+    lat1, lng1, lat2, lng2 = map(math.radians, [lat1, lng1, lat2, lng2])
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def bounding_box(
+    latitude: float, longitude: float, radius_km: float
+) -> Tuple[float, float, Optional[float], Optional[float]]:
+    """Smallest latitude/longitude box in degrees enclosing a radius
+
+    Returns (min_lat, max_lat, min_lng, max_lng). The longitude bounds are
+    None when the circle covers a pole, and fall outside [-180, 180] when it
+    crosses the antimeridian.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    min_lat = latitude - math.degrees(angular)
+    max_lat = latitude + math.degrees(angular)
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+
+    delta_lng = math.degrees(
+        math.asin(min(math.sin(angular) / math.cos(math.radians(latitude)), 1.0))
+    )
+    return min_lat, max_lat, longitude - delta_lng, longitude + delta_lng
+
+
+def _read_only(values) -> np.ndarray:
+    array = np.ascontiguousarray(values, dtype=np.float64)
+    array.setflags(write=False)
+    return array
+
+
+@dataclass(frozen=True)
+class DistanceKernel:
+    """Great-circle distances from any origin to a fixed set of points
+
+    Each point's sin/cos of latitude and radian longitude are computed once,
+    so a query costs one cosine per point. Uses the haversine identity
+    a = (1 - sin(lat0)sin(lat) - cos(lat0)cos(lat)cos(dlng)) / 2.
+    """
+
+    sin_lat: np.ndarray
+    cos_lat: np.ndarray
+    lng: np.ndarray  # radians
+
+    @classmethod
+    def from_coordinates(
+        cls, latitudes: Iterable[float], longitudes: Iterable[float]
+    ) -> "DistanceKernel":
+        """Build from latitudes and longitudes in degrees"""
+        lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+        lng = np.radians(np.asarray(longitudes, dtype=np.float64))
+        return cls(_read_only(np.sin(lat)), _read_only(np.cos(lat)), _read_only(lng))
+
+    def __len__(self):
+        return len(self.lng)
+
+    def take(self, rows: np.ndarray) -> "DistanceKernel":
+        """Kernel over a subset of the points"""
+        return DistanceKernel(self.sin_lat[rows], self.cos_lat[rows], self.lng[rows])
+
+    def distances_from(self, lat: float, lng: float) -> np.ndarray:
+        """Distances in km from one origin to every point"""
+        lat0, lng0 = math.radians(lat), math.radians(lng)
+        a = 0.5 * (
+            1.0
+            - math.sin(lat0) * self.sin_lat
+            - math.cos(lat0) * self.cos_lat * np.cos(self.lng - lng0)
+        )
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    def distances_from_many(
+        self, latitudes: Iterable[float], longitudes: Iterable[float]
+    ) -> np.ndarray:
+        """Distances in km as an (origins x points) matrix"""
+        lat0 = np.radians(np.asarray(latitudes, dtype=np.float64))[:, None]
+        lng0 = np.radians(np.asarray(longitudes, dtype=np.float64))[:, None]
+        a = 0.5 * (
+            1.0
+            - np.sin(lat0) * self.sin_lat
+            - np.cos(lat0) * self.cos_lat * np.cos(self.lng - lng0)
+        )
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
@@ -0,0 +1,143 @@
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
+import numpy as np
+
+from app.config import get_setting
+from app.services.distance import EARTH_RADIUS_KM
+
+T = TypeVar("T")
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# fetch(cells) -> [(distance_km, item)] for every item stored in those cells
+Fetch = Callable[[List[int]], List[Tuple[float, T]]]
+
+
+class Grid:
+    """Fixed-size latitude/longitude cells, numbered row-major from (-90, -180)
+
+    A market's cell is stored at write time, so a neighbourhood lookup reads
+    the origin's cell and rings of neighbouring cells instead of every row.
+    Longitude wraps around the antimeridian; rows stop at the poles.
+    """
+
+    def __init__(self, size: float):
+        self.size = size
+        self.rows = math.ceil(180 / size)
+        self.cols = math.ceil(360 / size)
+
+    def position(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        """(row, col) of the cell containing a point"""
+        row = min(max(int((latitude + 90) // self.size), 0), self.rows - 1)
+        col = int((longitude + 180) // self.size) % self.cols
+        return row, col
+
+    def cell(self, latitude: Optional[float], longitude: Optional[float]):
+        """Cell id of a point, or None without coordinates"""
+        if latitude is None or longitude is None:
+            return None
+        row, col = self.position(latitude, longitude)
+        return row * self.cols + col
+
+    def cells(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """Cell ids for arrays of points"""
+        rows = np.clip((np.asarray(latitudes) + 90) // self.size, 0, self.rows - 1)
+        cols = ((np.asarray(longitudes) + 180) // self.size) % self.cols
+        return rows.astype(np.int64) * self.cols + cols.astype(np.int64)
+
+    def square(self, row: int, col: int, radius: int) -> Set[int]:
+        """Cells within `radius` rows and columns of (row, col)"""
+        if radius < 0:
+            return set()
+        rows = range(max(row - radius, 0), min(row + radius, self.rows - 1) + 1)
+        if 2 * radius + 1 >= self.cols:
+            cols = range(self.cols)
+        else:
+            cols = [c % self.cols for c in range(col - radius, col + radius + 1)]
+        return {r * self.cols + c for r in rows for c in cols}
+
+    def ring(self, row: int, col: int, radius: int) -> List[int]:
+        """Cells exactly `radius` steps from (row, col)"""
+        ring = self.square(row, col, radius) - self.square(row, col, radius - 1)
+        return sorted(ring)
+
+    def covered_km(self, latitude: float, longitude: float, radius: int) -> float:
+        """Distance from a point that rings 0..radius around it fully cover"""
+        row, col = self.position(latitude, longitude)
+        # Offsets of the point inside its own cell, in degrees
+        north_south = latitude + 90 - row * self.size
+        east_west = (longitude + 180) % 360 - col * self.size
+
+        covered = math.inf
+        if row - radius > 0:
+            covered = min(covered, north_south + radius * self.size)
+        if row + radius < self.rows - 1:
+            covered = min(covered, (radius + 1) * self.size - north_south)
+        covered *= KM_PER_DEGREE
+        if 2 * radius + 1 < self.cols:
+            delta = min(
+                east_west + radius * self.size,
+                (radius + 1) * self.size - east_west,
+                90.0,
+            )
+            # Closest approach to a meridian delta degrees away
+            along = math.cos(math.radians(latitude)) * math.sin(math.radians(delta))
+            covered = min(covered, EARTH_RADIUS_KM * math.asin(min(along, 1.0)))
+        return covered
+
+    def cells_within(
+        self, latitude: float, longitude: float, radius_km: float, limit: int
+    ) -> Optional[List[int]]:
+        """Cells covering a radius, or None if that takes more than `limit`"""
+        radius = 0
+        while self.covered_km(latitude, longitude, radius) < radius_km:
+            radius += 1
+            if (2 * radius + 1) ** 2 > limit:
+                return None
+        row, col = self.position(latitude, longitude)
+        return sorted(self.square(row, col, radius))
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        fetch: Fetch,
+        max_rings: int,
+    ) -> Optional[List[Tuple[float, T]]]:
+        """k nearest items by expanding rings around the origin's cell
+
+        Stops once k items lie within the distance the searched rings fully
+        cover. Returns None if that needs more than `max_rings` rings, so the
+        caller can fall back to a wider search.
+        """
+        row, col = self.position(latitude, longitude)
+        found: List[Tuple[float, T]] = []
+        for radius in range(max_rings + 1):
+            found.extend(fetch(self.ring(row, col, radius)))
+            covered = self.covered_km(latitude, longitude, radius)
+            found.sort(key=lambda pair: pair[0])
+            if len(found) >= k and found[k - 1][0] <= covered:
+                return found[:k]
+            if covered == math.inf:  # Whole globe searched
+                return found[:k]
+        return None
+
+
+def market_grid() -> Grid:
+    """Grid at the configured cell size"""
+    return Grid(get_setting("GRID_CELL_DEGREES"))
+
+
+def bucket_rows(cells: np.ndarray) -> Dict[int, np.ndarray]:
+    """Map each cell id to the rows it holds"""
+    order = np.argsort(cells, kind="stable")
+    unique, starts = np.unique(cells[order], return_index=True)
+    return {int(cell): rows for cell, rows in zip(unique, np.split(order, starts[1:]))}
+
+
+def rows_in(buckets: Dict[int, np.ndarray], cells: Iterable[int]) -> np.ndarray:
+    """Rows stored in any of the given cells"""
+    parts = [buckets[cell] for cell in cells if cell in buckets]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
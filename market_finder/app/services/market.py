@@ -1,12 +1,65 @@
 from app import db
+from app.config import get_setting
 from app.models.market import Market, MarketCategory, MarketImage
+from app.services.catalogue import (
+    CATALOGUE_NAME,
+    POSITIONS_NAME,
+    bump_catalogue_version,
+    mark_catalogue_seen,
+)
+from app.services.distance import EARTH_RADIUS_KM, DistanceKernel, bounding_box
+from app.services.grid import market_grid
+from app.services.market_snapshot import invalidate_market_snapshot
+from app.services.routing import get_routing_provider
+from app.services.spatial_index import market_index
 from app.utils.file_handler import FileHandler
 from app.logging import get_logger
-from sqlalchemy import or_
+from sqlalchemy import inspect, or_, text
+from sqlalchemy.orm import selectinload
 
 # Setup logging
 logger = get_logger(__name__)
 
+# Half the Earth's circumference: a radius this large covers every market
+MAX_RADIUS_KM = 20016
+
+
+def _by_distance(latitude, longitude, markets):
+    """(distance_km, market) pairs nearest first, by exact Haversine"""
+    if not markets:
+        return []
+    distances = DistanceKernel.from_coordinates(
+        [market.latitude for market in markets],
+        [market.longitude for market in markets],
+    ).distances_from(latitude, longitude)
+    return sorted(zip(distances.tolist(), markets), key=lambda pair: pair[0])
+
+
+def _is_simple_box(box):
+    """Whether a bounding box is one rectangle (no pole or antimeridian)"""
+    _, _, min_lng, max_lng = box
+    return min_lng is not None and min_lng >= -180 and max_lng <= 180
+
+
+# Database URL -> whether markets.location_point exists, checked once
+_location_point_columns = {}
+
+
+def _has_location_point(bind):
+    """Whether the markets table has the MySQL spatial point column
+
+    Only migration 8e4b6f0c2d13 adds it; tables made by db.create_all()
+    lack it and are searched through the grid or bounding box instead.
+    """
+    key = bind.url.render_as_string()
+    if key not in _location_point_columns:
+        columns = inspect(bind).get_columns("markets")
+        found = any(column["name"] == "location_point" for column in columns)
+        if not found:
+            logger.warning("markets.location_point missing, not using spatial index")
+        _location_point_columns[key] = found
+    return _location_point_columns[key]
+
 
 class MarketService:
     """Service class for Market operations"""
@@ -18,7 +71,10 @@ class MarketService:
             f"Fetching markets - page: {page}, per_page: {per_page}, search: {search}"
         )
 
-        query = Market.query.filter_by(is_active=True)
+        # Images are serialised with each market: load them in one extra query
+        query = Market.query.options(selectinload(Market.images)).filter_by(
+            is_active=True
+        )
 
         # Apply search filter
         if search:
@@ -75,6 +131,20 @@ class MarketService:
 
         return market
 
+    @staticmethod
+    def get_markets_by_ids(market_ids):
+        """Get active markets by ID, preserving the order of market_ids"""
+        if not market_ids:
+            return []
+
+        markets = (
+            Market.query.options(selectinload(Market.images))
+            .filter(Market.id.in_(market_ids), Market.is_active == True)
+            .all()
+        )
+        by_id = {market.id: market for market in markets}
+        return [by_id[market_id] for market_id in market_ids if market_id in by_id]
+
     @staticmethod
     def create_market(data, files=None):
         """Create new market with optional images"""
@@ -86,6 +156,7 @@ class MarketService:
         market.location = data.get("location")
         market.latitude = data.get("latitude")
         market.longitude = data.get("longitude")
+        market.grid_cell = market_grid().cell(market.latitude, market.longitude)
 
         # Handle category
         category = data.get("category")
@@ -124,7 +195,11 @@ class MarketService:
                     logger.error(f"Error saving image: {str(e)}")
                     # Continue with other images even if one fails
 
+        versions = bump_catalogue_version(CATALOGUE_NAME)
         db.session.commit()
+        invalidate_market_snapshot()
+        market_index.sync_market(market)
+        mark_catalogue_seen(versions)
 
         logger.info(f"Successfully created market with ID: {market.id}")
         return market
@@ -139,6 +214,9 @@ class MarketService:
             logger.warning(f"Market not found for update with ID: {market_id}")
             return None
 
+        old_position = (market.latitude, market.longitude)
+        was_active, old_category = market.is_active, market.category
+
         # Update market fields
         for key, value in data.items():
             if hasattr(market, key) and key not in ["id", "images"]:
@@ -154,6 +232,7 @@ class MarketService:
                             continue
                 logger.debug(f"Updating {key}: {getattr(market, key)} -> {value}")
                 setattr(market, key, value)
+        market.grid_cell = market_grid().cell(market.latitude, market.longitude)
 
         # Handle image deletions
         if delete_image_ids:
@@ -189,7 +268,24 @@ class MarketService:
                 except Exception as e:
                     logger.error(f"Error saving new image: {str(e)}")
 
+        # Only changes the shared caches reflect are announced to other
+        # workers; description and image edits leave their caches intact
+        moved = (market.latitude, market.longitude) != old_position
+        deactivated = was_active and not market.is_active
+        changed = (
+            moved or market.is_active != was_active or market.category != old_category
+        )
+        names = [CATALOGUE_NAME] if changed else []
+        if moved or deactivated:
+            names.append(POSITIONS_NAME)
+        versions = bump_catalogue_version(*names) if names else {}
         db.session.commit()
+        if changed:
+            invalidate_market_snapshot()
+            market_index.sync_market(market)
+        if moved or deactivated:
+            MarketService._invalidate_routes(market.id)
+        mark_catalogue_seen(versions)
         logger.info(f"Successfully updated market: {market.name}")
         return market
 
@@ -210,34 +306,188 @@ class MarketService:
 
         # Soft delete market (images will be deleted by cascade)
         market.is_active = False
+        versions = bump_catalogue_version(CATALOGUE_NAME, POSITIONS_NAME)
         db.session.commit()
+        invalidate_market_snapshot()
+        market_index.remove(market.id)
+        MarketService._invalidate_routes(market.id)
+        mark_catalogue_seen(versions)
 
         logger.info(f"Successfully deleted market: {market.name}")
         return True
 
+    @staticmethod
+    def _invalidate_routes(market_id):
+        """Drop cached and precomputed route distances for a market"""
+        get_routing_provider().invalidate_market(market_id)
+
     @staticmethod
     def search_markets_by_location(latitude, longitude, radius_km=10):
-        """Search markets by location within radius"""
+        """Search markets by location within radius, nearest first"""
         logger.info(
             f"Searching markets within {radius_km}km of ({latitude}, {longitude})"
         )
 
-        # Simple distance calculation (you can use more sophisticated methods)
-        markets = Market.query.filter_by(is_active=True).all()
-        nearby_markets = []
+        nearby = MarketService._markets_within(latitude, longitude, radius_km)
+
+        logger.info(f"Found {len(nearby)} markets within radius")
+        return [
+            {**market.to_dict(), "distance_km": round(distance, 2)}
+            for distance, market in nearby
+        ]
+
+    @staticmethod
+    def get_nearest_markets(latitude, longitude, limit):
+        """Get the nearest active markets as (distance_km, market) pairs
+
+        Reads the target's grid cell and rings of neighbouring cells, then
+        falls back to a doubling radius search when markets are sparse, so
+        the database only ever scans the neighbourhood of the target.
+        """
+        radius_km = get_setting("NEAREST_START_RADIUS_KM")
+        use_grid = MarketService._grid_complete()
+        if use_grid:
+            grid = market_grid()
+            nearest = grid.nearest(
+                latitude,
+                longitude,
+                limit,
+                lambda cells: MarketService._markets_in_cells(
+                    latitude, longitude, cells
+                ),
+                get_setting("GRID_MAX_RINGS"),
+            )
+            if nearest is not None:
+                return nearest
+            radius_km = max(
+                radius_km,
+                grid.covered_km(latitude, longitude, get_setting("GRID_MAX_RINGS")),
+            )
+
+        while True:
+            nearby = MarketService._markets_within(
+                latitude, longitude, radius_km, use_grid
+            )
+            if len(nearby) >= limit or radius_km >= MAX_RADIUS_KM:
+                return nearby[:limit]
+            radius_km *= 2
+
+    @staticmethod
+    def _markets_within(latitude, longitude, radius_km, use_grid=None):
+        """(distance_km, market) pairs within radius, nearest first"""
+        box = bounding_box(latitude, longitude, radius_km)
+        bind = db.session.get_bind()
+        if (
+            bind.dialect.name == "mysql"
+            and _is_simple_box(box)
+            and _has_location_point(bind)
+        ):
+            return MarketService._markets_within_spatial(
+                latitude, longitude, radius_km, box
+            )
+        if use_grid is None:
+            use_grid = MarketService._grid_complete()
+        # Small radii read the grid cells around the target, wide ones a box
+        cells = None
+        if use_grid:
+            cells = market_grid().cells_within(
+                latitude, longitude, radius_km, get_setting("GRID_MAX_CELLS")
+            )
+        if cells is not None:
+            nearby = MarketService._markets_in_cells(latitude, longitude, cells)
+            return [pair for pair in nearby if pair[0] <= radius_km]
+        return MarketService._markets_within_box(latitude, longitude, radius_km, box)
+
+    @staticmethod
+    def _grid_complete():
+        """Whether every active market with coordinates has a grid cell
+
+        Until `flask markets backfill-grid` fills rows left without one,
+        searches use the lat/lng box so those markets are still found.
+        """
+        missing = (
+            db.session.query(Market.id)
+            .filter(
+                Market.is_active == True,
+                Market.grid_cell.is_(None),
+                Market.latitude.isnot(None),
+                Market.longitude.isnot(None),
+            )
+            .first()
+        )
+        if missing is not None:
+            logger.warning("Markets without a grid cell, searching by bounding box")
+        return missing is None
 
-        for market in markets:
-            if market.latitude and market.longitude:
-                # Calculate approximate distance
-                lat_diff = abs(market.latitude - latitude)
-                lng_diff = abs(market.longitude - longitude)
+    @staticmethod
+    def _markets_in_cells(latitude, longitude, cells):
+        """(distance_km, market) pairs stored in the given grid cells, nearest first"""
+        if not cells:
+            return []
+        candidates = (
+            Market.query.options(selectinload(Market.images))
+            .filter(Market.is_active == True, Market.grid_cell.in_(cells))
+            .all()
+        )
+        return _by_distance(latitude, longitude, candidates)
 
-                # Simple approximation (not accurate for large distances)
-                if lat_diff <= radius_km / 111 and lng_diff <= radius_km / 111:
-                    nearby_markets.append(market)
+    @staticmethod
+    def _markets_within_spatial(latitude, longitude, radius_km, box):
+        """MySQL: prune on the SPATIAL index, then exact ST_Distance_Sphere"""
+        min_lat, max_lat, min_lng, max_lng = box
+        # SRID 4326 uses latitude-longitude axis order, as does location_point
+        envelope = (
+            f"POLYGON(({min_lat} {min_lng}, {max_lat} {min_lng}, "
+            f"{max_lat} {max_lng}, {min_lat} {max_lng}, {min_lat} {min_lng}))"
+        )
+        rows = db.session.execute(
+            text(
+                "SELECT id, ST_Distance_Sphere(location_point, "
+                "ST_SRID(POINT(:lat, :lng), 4326), :radius_m) AS distance_m "
+                "FROM markets "
+                "WHERE MBRContains(ST_GeomFromText(:envelope, 4326), location_point) "
+                "AND is_active AND latitude IS NOT NULL AND longitude IS NOT NULL "
+                "HAVING distance_m <= :max_m ORDER BY distance_m"
+            ),
+            {
+                "lat": latitude,
+                "lng": longitude,
+                "radius_m": EARTH_RADIUS_KM * 1000,
+                "envelope": envelope,
+                "max_m": radius_km * 1000,
+            },
+        ).all()
+        distances = {row.id: row.distance_m / 1000 for row in rows}
+        markets = MarketService.get_markets_by_ids(list(distances))
+        return [(distances[market.id], market) for market in markets]
 
-        logger.info(f"Found {len(nearby_markets)} markets within radius")
-        return [market.to_dict() for market in nearby_markets]
+    @staticmethod
+    def _markets_within_box(latitude, longitude, radius_km, box):
+        """Wide radii: lat/lng box in SQL, exact Haversine in NumPy"""
+        # Bounding box prefilter, served by the (is_active, lat, lng) index
+        min_lat, max_lat, min_lng, max_lng = box
+        query = Market.query.options(selectinload(Market.images)).filter(
+            Market.is_active == True, Market.latitude.between(min_lat, max_lat)
+        )
+        if min_lng is None:
+            query = query.filter(Market.longitude.isnot(None))
+        elif min_lng < -180:  # Box wraps across the antimeridian
+            query = query.filter(
+                or_(Market.longitude >= min_lng + 360, Market.longitude <= max_lng)
+            )
+        elif max_lng > 180:
+            query = query.filter(
+                or_(Market.longitude >= min_lng, Market.longitude <= max_lng - 360)
+            )
+        else:
+            query = query.filter(Market.longitude.between(min_lng, max_lng))
+        candidates = query.all()
+        logger.debug(f"{len(candidates)} bounding box candidates")
+        return [
+            pair
+            for pair in _by_distance(latitude, longitude, candidates)
+            if pair[0] <= radius_km
+        ]
 
     @staticmethod
     def search_markets(query, page, per_page):
@@ -247,7 +497,8 @@ class MarketService:
         )
 
         markets_pagination = (
-            Market.query.filter(
+            Market.query.options(selectinload(Market.images))
+            .filter(
                 or_(
                     Market.name.contains(query),
                     Market.location.contains(query),
@@ -0,0 +1,120 @@
+import threading
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app import db
+from app.models.market import Market
+from app.services.catalogue import on_catalogue_change, sync_catalogue
+from app.services.distance import DistanceKernel
+from app.services.grid import Grid, bucket_rows, market_grid
+from app.logging import get_logger
+
+# Setup logging
+logger = get_logger(__name__)
+
+
+def _read_only(values, dtype) -> np.ndarray:
+    array = np.asarray(values, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Read-optimised, read-only view of active market coordinates
+
+    Parallel arrays indexed by row; `row_by_id` maps market id to row.
+    Instances are shared across requests and must not be mutated.
+    """
+
+    ids: np.ndarray
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    categories: np.ndarray  # integer codes into category_labels
+    category_labels: Tuple[Optional[str], ...]
+    row_by_id: Dict[int, int] = field(repr=False)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> "MarketSnapshot":
+        """Build from (id, latitude, longitude, category) rows"""
+        rows = list(rows)
+        labels: Dict[Optional[str], int] = {}
+        codes = []
+        for row in rows:
+            category = row[3].value if hasattr(row[3], "value") else row[3]
+            codes.append(labels.setdefault(category, len(labels)))
+
+        ids = _read_only([row[0] for row in rows], np.int64)
+        return cls(
+            ids=ids,
+            latitudes=_read_only([row[1] for row in rows], np.float64),
+            longitudes=_read_only([row[2] for row in rows], np.float64),
+            categories=_read_only(codes, np.int64),
+            category_labels=tuple(labels),
+            row_by_id={int(market_id): row for row, market_id in enumerate(ids)},
+        )
+
+    @classmethod
+    def load(cls) -> "MarketSnapshot":
+        """Build from a column-only query of active markets with coordinates"""
+        rows = (
+            db.session.query(
+                Market.id, Market.latitude, Market.longitude, Market.category
+            )
+            .filter(Market.is_active == True)
+            .filter(Market.latitude.isnot(None), Market.longitude.isnot(None))
+            .order_by(Market.id)
+            .all()
+        )
+        return cls.from_rows(rows)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def ids_at(self, rows: Iterable[int]) -> List[int]:
+        """Market ids for the given rows"""
+        return [int(self.ids[row]) for row in rows]
+
+    @cached_property
+    def kernel(self) -> DistanceKernel:
+        """Distance kernel over all rows, built on first use"""
+        return DistanceKernel.from_coordinates(self.latitudes, self.longitudes)
+
+    @cached_property
+    def grid(self) -> Grid:
+        """Grid that cell_rows is bucketed by (configured size at first use)"""
+        return market_grid()
+
+    @cached_property
+    def cell_rows(self) -> Dict[int, np.ndarray]:
+        """Rows bucketed by grid cell, built on first use"""
+        return bucket_rows(self.grid.cells(self.latitudes, self.longitudes))
+
+
+_snapshot: Optional[MarketSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_market_snapshot() -> MarketSnapshot:
+    """Get the shared snapshot, reloading it if the catalogue changed"""
+    global _snapshot
+    sync_catalogue()
+    snapshot = _snapshot
+    if snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = MarketSnapshot.load()
+                logger.info(f"Market snapshot loaded with {len(_snapshot)} markets")
+            snapshot = _snapshot
+    return snapshot
+
+
+@on_catalogue_change
+def invalidate_market_snapshot():
+    """Drop the shared snapshot so it is reloaded on next use"""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
@@ -0,0 +1,145 @@
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from app.config import get_setting
+from app.services.grid import rows_in
+from app.services.market import MarketService
+from app.services.market_snapshot import MarketSnapshot, get_market_snapshot
+from app.logging import get_logger
+
+# Setup logging
+logger = get_logger(__name__)
+
+# Cap on origin x market distances held in memory at once (~16 MB of float64)
+MAX_BATCH_CELLS = 2_000_000
+
+# From this many markets, per-origin grid lookups beat one dense matrix
+GRID_MIN_MARKETS = 20_000
+
+Origin = Tuple[float, float]  # (lat, lng)
+
+
+def nearest_rows(
+    snapshot: MarketSnapshot, origins: Sequence[Origin], limit: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """k nearest snapshot rows and Haversine distances for each origin
+
+    Returns (rows, distances_km), both shaped (len(origins), k) and sorted by
+    distance. Large catalogues are searched ring by ring in the snapshot's
+    grid; smaller ones as one (origins x markets) matrix.
+    """
+    k = min(limit, len(snapshot))
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    if len(snapshot) >= GRID_MIN_MARKETS:
+        return _nearest_rows_in_grid(snapshot, origins, k)
+    return _nearest_rows_dense(snapshot, origins, k)
+
+
+def _nearest_rows_dense(
+    snapshot: MarketSnapshot, origins: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    distances = snapshot.kernel.distances_from_many(origins[:, 0], origins[:, 1])
+
+    if k < distances.shape[1]:
+        rows = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        rows = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+    nearest = np.take_along_axis(distances, rows, axis=1)
+    order = np.argsort(nearest, axis=1, kind="stable")
+    return (
+        np.take_along_axis(rows, order, axis=1),
+        np.take_along_axis(nearest, order, axis=1),
+    )
+
+
+def _nearest_rows_in_grid(
+    snapshot: MarketSnapshot, origins: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    rows = np.empty((len(origins), k), dtype=np.int64)
+    distances = np.empty((len(origins), k), dtype=np.float64)
+    max_rings = get_setting("GRID_MAX_RINGS")
+
+    for i, (lat, lng) in enumerate(origins):
+        nearest = snapshot.grid.nearest(
+            lat,
+            lng,
+            k,
+            lambda cells: _rows_by_distance(snapshot, lat, lng, cells),
+            max_rings,
+        )
+        if nearest is None:  # Sparse neighbourhood, scan every row
+            dense_rows, dense_distances = _nearest_rows_dense(
+                snapshot, origins[i : i + 1], k
+            )
+            rows[i], distances[i] = dense_rows[0], dense_distances[0]
+        else:
+            distances[i] = [distance for distance, _ in nearest]
+            rows[i] = [row for _, row in nearest]
+    return rows, distances
+
+
+def _rows_by_distance(
+    snapshot: MarketSnapshot, lat: float, lng: float, cells: List[int]
+) -> List[Tuple[float, int]]:
+    rows = rows_in(snapshot.cell_rows, cells)
+    distances = snapshot.kernel.take(rows).distances_from(lat, lng)
+    return list(zip(distances.tolist(), rows.tolist()))
+
+
+def iter_nearest_markets(
+    origins: Sequence[Dict[str, Any]], limit: int
+) -> Iterator[Dict[str, Any]]:
+    """Yield the nearest markets for each origin, in input order
+
+    Each origin is a dict with latitude, longitude and an optional id. All
+    origins are answered from one market snapshot, in chunks sized so the
+    distance matrix stays bounded, and each market is serialised once.
+    """
+    snapshot = get_market_snapshot()
+    if not len(snapshot):
+        for index, origin in enumerate(origins):
+            yield _result(index, origin, [])
+        return
+
+    chunk_size = max(1, min(len(origins), MAX_BATCH_CELLS // len(snapshot)))
+    market_dicts: Dict[int, Dict[str, Any]] = {}
+
+    for start in range(0, len(origins), chunk_size):
+        chunk = origins[start : start + chunk_size]
+        rows, distances = nearest_rows(
+            snapshot,
+            [(origin["latitude"], origin["longitude"]) for origin in chunk],
+            limit,
+        )
+
+        # Hydrate markets not seen in earlier chunks with one query
+        missing = [
+            market_id
+            for market_id in snapshot.ids_at(np.unique(rows))
+            if market_id not in market_dicts
+        ]
+        for market in MarketService.get_markets_by_ids(missing):
+            market_dicts[market.id] = market.to_dict()
+
+        for offset, origin in enumerate(chunk):
+            markets = []
+            for row, distance in zip(rows[offset], distances[offset]):
+                market = market_dicts.get(int(snapshot.ids[row]))
+                if market is not None:  # Deactivated since the snapshot
+                    markets.append({**market, "distance_km": round(float(distance), 2)})
+            yield _result(start + offset, origin, markets)
+
+
+def _result(
+    index: int, origin: Dict[str, Any], markets: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    result = {
+        "index": index,
+        "latitude": origin["latitude"],
+        "longitude": origin["longitude"],
+        "markets": markets,
+    }
+    if origin.get("id") is not None:
+        result["id"] = origin["id"]
+    return result
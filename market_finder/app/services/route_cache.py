@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from app.config import get_setting
+from app.services.catalogue import POSITIONS_NAME, on_catalogue_change
+from app.logging import get_logger
+
+# Setup logging
+logger = get_logger(__name__)
+
+CacheKey = Tuple[float, float, int]  # (origin cell lat, origin cell lng, market id)
+
+
+class RouteDistanceCache:
+    """Process-wide LRU cache of route distances with TTL
+
+    Origins are quantized to a grid cell (rounded to `precision` decimal
+    degrees) so users in the same neighbourhood share cached distances.
+    """
+
+    def __init__(self, precision: int = 3, ttl: float = 3600, maxsize: int = 10000):
+        self.precision = precision
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, Tuple[float, float]]" = OrderedDict()
+        self._keys_by_market: Dict[int, Set[CacheKey]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def origin_cell(self, origin: Tuple[float, float]) -> Tuple[float, float]:
+        """Quantize an origin to its grid cell"""
+        return round(origin[0], self.precision), round(origin[1], self.precision)
+
+    def _key(self, origin: Tuple[float, float], market_id: int) -> CacheKey:
+        return (*self.origin_cell(origin), market_id)
+
+    def _discard(self, key: CacheKey):
+        self._entries.pop(key, None)
+        keys = self._keys_by_market.get(key[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_market[key[2]]
+
+    def get(self, origin: Tuple[float, float], market_id: int) -> Optional[float]:
+        """Get cached distance in km, or None on miss"""
+        key = self._key(origin, market_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            distance, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                self._discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return distance
+
+    def set(self, origin: Tuple[float, float], market_id: int, distance: float):
+        """Store a distance in km"""
+        key = self._key(origin, market_id)
+        with self._lock:
+            self._entries[key] = (distance, time.monotonic())
+            self._entries.move_to_end(key)
+            self._keys_by_market.setdefault(market_id, set()).add(key)
+
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate_market(self, market_id: int):
+        """Drop all cached distances for a market (e.g. after it moved)"""
+        with self._lock:
+            keys = self._keys_by_market.pop(market_id, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+
+        if keys:
+            logger.debug(
+                f"Invalidated {len(keys)} cached routes for market {market_id}"
+            )
+
+    def clear(self):
+        """Drop all cached distances"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_market.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_route_cache() -> RouteDistanceCache:
+    """Get the shared per-process route distance cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RouteDistanceCache(
+                    precision=get_setting("ROUTE_CACHE_PRECISION"),
+                    ttl=get_setting("ROUTE_CACHE_TTL"),
+                    maxsize=get_setting("ROUTE_CACHE_MAXSIZE"),
+                )
+    return _cache
+
+
+def _clear_route_cache():
+    # Another worker moved or removed a market; we cannot tell which one
+    if _cache is not None:
+        _cache.clear()
+
+
+on_catalogue_change(_clear_route_cache, POSITIONS_NAME)
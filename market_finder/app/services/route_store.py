@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+from app.config import get_setting
+from app.logging import get_logger
+
+# Setup logging
+logger = get_logger(__name__)
+
+
+class RouteDistanceStore:
+    """Persistent SQLite store of route distances shared by all workers
+
+    Rows are keyed on (origin cell, market id), matching the in-memory route
+    cache. The database runs in WAL mode so concurrent gunicorn workers can read
+    while another one writes.
+    """
+
+    def __init__(self, path: str, ttl: float = 30 * 86400):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS route_distances (
+                    cell_lat REAL NOT NULL,
+                    cell_lng REAL NOT NULL,
+                    market_id INTEGER NOT NULL,
+                    distance_km REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (cell_lat, cell_lng, market_id)
+                )
+                """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_route_distances_market_id "
+                "ON route_distances (market_id)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection (sqlite3 connections are not shareable)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(
+        self, cell: Tuple[float, float], market_ids: Iterable[int]
+    ) -> Dict[int, float]:
+        """Get stored distances in km for the given markets from an origin cell"""
+        market_ids = list(market_ids)
+        if not market_ids:
+            return {}
+
+        placeholders = ",".join("?" * len(market_ids))
+        try:
+            rows = (
+                self._connection()
+                .execute(
+                    "SELECT market_id, distance_km FROM route_distances "
+                    "WHERE cell_lat = ? AND cell_lng = ? AND updated_at >= ? "
+                    f"AND market_id IN ({placeholders})",
+                    (*cell, time.time() - self.ttl, *market_ids),
+                )
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Route store read failed: {str(e)}")
+            return {}
+        return dict(rows)
+
+    def set_many(self, cell: Tuple[float, float], distances: Dict[int, float]):
+        """Store distances in km for markets from an origin cell"""
+        if not distances:
+            return
+
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO route_distances "
+                    "(cell_lat, cell_lng, market_id, distance_km, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (*cell, market_id, distance, now)
+                        for market_id, distance in distances.items()
+                    ],
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Route store write failed: {str(e)}")
+
+    def invalidate_market(self, market_id: int):
+        """Delete all stored distances for a market"""
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "DELETE FROM route_distances WHERE market_id = ?", (market_id,)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Route store invalidation failed: {str(e)}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_route_store() -> Optional[RouteDistanceStore]:
+    """Get the shared route store, or None if it is disabled"""
+    global _store
+    if _store is None and get_setting("ROUTE_STORE_ENABLED"):
+        with _store_lock:
+            if _store is None:
+                path = get_setting("ROUTE_STORE_PATH")
+                if not path and has_app_context():
+                    path = os.path.join(
+                        current_app.instance_path, "route_distances.sqlite3"
+                    )
+                if not path:
+                    return None
+                _store = RouteDistanceStore(path, ttl=get_setting("ROUTE_STORE_TTL"))
+                logger.info(f"Route distance store opened at {path}")
+    return _store
@@ -0,0 +1,599 @@
+import json
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+
+from app.config import get_setting
+from app.services.catalogue import sync_catalogue
+from app.services.distance import DistanceKernel
+from app.services.route_cache import get_route_cache
+from app.services.route_store import get_route_store
+from app.logging import get_logger
+
+# Setup logging
+logger = get_logger(__name__)
+
+Coordinate = Tuple[float, float]  # (latitude, longitude)
+
+# osrm-routed rejects Table requests over --max-table-size (default 100)
+# coordinates; one of them is the source
+OSRM_MAX_TABLE_DESTINATIONS = 99
+
+# Matrix columns are only valid while a market stays where it was built (~0.1 m)
+POSITION_TOLERANCE_DEGREES = 1e-6
+
+
+class CircuitBreaker:
+    """Circuit breaker tracking recent failures and latency of a dependency
+
+    After `failure_threshold` consecutive failures (errors or calls slower than
+    `latency_budget`) the breaker opens and rejects calls for `cooldown`
+    seconds. It then lets a single probe through (half-open); the probe's
+    outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        cooldown: float = 30,
+        latency_budget: float = 1.5,
+        window: int = 50,
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latency_budget = latency_budget
+
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._recent = deque(maxlen=window)  # (succeeded, latency seconds)
+
+    def is_open(self) -> bool:
+        """Check whether calls are currently rejected without a probe"""
+        with self._lock:
+            return (
+                self.state == self.OPEN
+                and time.monotonic() - self.opened_at < self.cooldown
+            )
+
+    def allow_request(self) -> bool:
+        """Check whether a call may go to the dependency right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = self.HALF_OPEN
+                logger.info("OSRM circuit half-open, sending probe request")
+
+            # Half-open: only one probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record(self, succeeded: bool, latency: float):
+        """Record the outcome of a call"""
+        if succeeded and latency > self.latency_budget:
+            succeeded = False  # too slow counts as a failure
+
+        with self._lock:
+            self._recent.append((succeeded, latency))
+            was_probe = self._probe_in_flight
+            self._probe_in_flight = False
+
+            if succeeded:
+                self.consecutive_failures = 0
+                if self.state != self.CLOSED:
+                    logger.info("OSRM circuit closed")
+                self.state = self.CLOSED
+                return
+
+            self.consecutive_failures += 1
+            probe_failed = self.state == self.HALF_OPEN and was_probe
+            if probe_failed or (
+                self.state == self.CLOSED
+                and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                logger.warning(
+                    f"OSRM circuit opened after {self.consecutive_failures} "
+                    f"failures, using Haversine for {self.cooldown}s"
+                )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get breaker state and recent call statistics"""
+        with self._lock:
+            recent = list(self._recent)
+            state = self.state
+            if (
+                state == self.OPEN
+                and time.monotonic() - self.opened_at >= self.cooldown
+            ):
+                state = self.HALF_OPEN
+
+        failures = sum(1 for succeeded, _ in recent if not succeeded)
+        latencies = [latency for _, latency in recent]
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "recent_calls": len(recent),
+            "recent_failure_rate": round(failures / len(recent), 3) if recent else 0.0,
+            "avg_latency_ms": (
+                round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None
+            ),
+        }
+
+
+class DisabledBreaker(CircuitBreaker):
+    """Breaker that never opens, for offline jobs that retry on their own"""
+
+    def is_open(self) -> bool:
+        return False
+
+    def allow_request(self) -> bool:
+        return True
+
+    def record(self, succeeded: bool, latency: float):
+        pass
+
+
+class OSRMClient:
+    """OSRM HTTP client with a pooled keep-alive session and bounded parallelism"""
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 3,
+        max_concurrency: int = 8,
+        deadline: float = 4,
+        ranking_mode: str = "table",
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.deadline = deadline
+        self.ranking_mode = ranking_mode
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="osrm"
+        )
+
+    def _get_json(self, url: str, timeout: float) -> Dict[str, Any]:
+        """GET a JSON document through the circuit breaker"""
+        if not self.breaker.allow_request():
+            raise RuntimeError("OSRM circuit is open")
+
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            self.breaker.record(False, time.monotonic() - started)
+            raise
+        self.breaker.record(True, time.monotonic() - started)
+        return data
+
+    def route_distance(self, start: Coordinate, end: Coordinate) -> Optional[float]:
+        """Get driving route distance in km, or None if OSRM fails"""
+        lat1, lng1 = start
+        lat2, lng2 = end
+        url = (
+            f"{self.base_url}/route/v1/driving/{lng1},{lat1};{lng2},{lat2}"
+            "?overview=false"
+        )
+        try:
+            data = self._get_json(url, self.timeout)
+            return data["routes"][0]["distance"] / 1000  # km
+        except Exception:
+            return None
+
+    def route_distances(
+        self, origin: Coordinate, destinations: Sequence[Coordinate]
+    ) -> List[Optional[float]]:
+        """Get route distances to all destinations concurrently
+
+        Lookups still running when the overall deadline passes are reported as
+        None so the caller can fall back to Haversine.
+        """
+        if self.breaker.is_open():
+            return [None] * len(destinations)
+
+        futures = [
+            self._executor.submit(self.route_distance, origin, destination)
+            for destination in destinations
+        ]
+        done, not_done = wait(futures, timeout=self.deadline)
+
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            logger.warning(
+                f"OSRM deadline of {self.deadline}s exceeded for "
+                f"{len(not_done)}/{len(futures)} routes"
+            )
+
+        return [future.result() if future in done else None for future in futures]
+
+    def table_distances(
+        self, origin: Coordinate, destinations: Sequence[Coordinate]
+    ) -> Optional[List[Optional[float]]]:
+        """Get distances to all destinations with a single OSRM Table request
+
+        Returns None if the request fails; unreachable destinations are None.
+        """
+        if not destinations:
+            return []
+
+        coordinates = ";".join(f"{lng},{lat}" for lat, lng in [origin, *destinations])
+        destination_indices = ";".join(str(i) for i in range(1, len(destinations) + 1))
+        url = (
+            f"{self.base_url}/table/v1/driving/{coordinates}"
+            f"?sources=0&destinations={destination_indices}&annotations=distance"
+        )
+        try:
+            data = self._get_json(url, min(self.timeout, self.deadline))
+            row = data["distances"][0]
+            if len(row) != len(destinations):
+                raise ValueError(
+                    f"expected {len(destinations)} distances, got {len(row)}"
+                )
+            return [None if meters is None else meters / 1000 for meters in row]  # km
+        except Exception as e:
+            logger.warning(f"OSRM table request failed: {str(e)}")
+            return None
+
+    def ranking_distances(
+        self, origin: Coordinate, destinations: Sequence[Coordinate]
+    ) -> List[Optional[float]]:
+        """Get distances for ranking using the configured mode
+
+        Table mode falls back to per-pair route lookups if the batch request fails.
+        """
+        if self.breaker.is_open():
+            logger.info("OSRM circuit open, skipping route lookups")
+            return [None] * len(destinations)
+
+        if self.ranking_mode == "table":
+            distances = self.table_distances(origin, destinations)
+            if distances is not None:
+                return distances
+            logger.info("Falling back to per-route OSRM lookups")
+        return self.route_distances(origin, destinations)
+
+    def close(self):
+        """Release pooled connections and worker threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+class RoutingProvider(ABC):
+    """Interface for computing road distances from an origin to markets
+
+    Markets are objects with id, latitude and longitude. Providers return one
+    distance in km per market, or None where they have no answer so the caller
+    can fall back to Haversine.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def distances(self, origin: Coordinate, markets: Sequence) -> List[Optional[float]]:
+        """Distances in km from origin to each market (None if unknown)"""
+
+    def invalidate_market(self, market_id: int):
+        """Forget anything known about a market (e.g. after it moved)"""
+
+
+class HaversineRoutingProvider(RoutingProvider):
+    """Great-circle distances, no network or precomputed data"""
+
+    name = "haversine"
+
+    def distances(self, origin: Coordinate, markets: Sequence) -> List[Optional[float]]:
+        if not markets:
+            return []
+        kernel = DistanceKernel.from_coordinates(
+            [market.latitude for market in markets],
+            [market.longitude for market in markets],
+        )
+        return kernel.distances_from(*origin).tolist()
+
+
+class OSRMRoutingProvider(RoutingProvider):
+    """OSRM road distances behind the route cache and persistent store"""
+
+    name = "osrm"
+
+    def __init__(self, client: OSRMClient):
+        self.client = client
+
+    def distances(self, origin: Coordinate, markets: Sequence) -> List[Optional[float]]:
+        sync_catalogue()  # Drop routes to markets another worker moved
+        cache = get_route_cache()
+        distances = [cache.get(origin, market.id) for market in markets]
+
+        # Consult the persistent store shared by all workers
+        misses = [i for i, distance in enumerate(distances) if distance is None]
+        store = get_route_store()
+        if misses and store is not None:
+            stored = store.get_many(
+                cache.origin_cell(origin), [markets[i].id for i in misses]
+            )
+            for i in misses:
+                distance = stored.get(markets[i].id)
+                if distance is not None:
+                    cache.set(origin, markets[i].id, distance)
+                    distances[i] = distance
+            misses = [i for i in misses if distances[i] is None]
+
+        # Ask OSRM for remaining misses: one table request, or concurrent routes
+        if misses:
+            fetched = self.client.ranking_distances(
+                origin, [(markets[i].latitude, markets[i].longitude) for i in misses]
+            )
+            found = {}
+            for i, distance in zip(misses, fetched):
+                distances[i] = distance
+                if distance is not None:
+                    cache.set(origin, markets[i].id, distance)
+                    found[markets[i].id] = distance
+            if store is not None:
+                store.set_many(cache.origin_cell(origin), found)
+
+        return distances
+
+    def invalidate_market(self, market_id: int):
+        get_route_cache().invalidate_market(market_id)
+        store = get_route_store()
+        if store is not None:
+            store.invalidate_market(market_id)
+
+
+class MatrixRoutingProvider(RoutingProvider):
+    """Precomputed grid-cell x market road distance matrix
+
+    The matrix is a float32 .npy file (km, NaN where unknown) memory-mapped
+    read-only, with a JSON sidecar describing the grid and market columns.
+    Build it offline with `flask routing build-matrix`. Markets no longer at
+    their build-time position get None, in every worker, until the next build.
+    """
+
+    name = "matrix"
+
+    def __init__(self, path: str):
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        self.lat_min = meta["lat_min"]
+        self.lng_min = meta["lng_min"]
+        self.cell_size = meta["cell_size"]
+        self.rows = meta["rows"]
+        self.cols = meta["cols"]
+        self.columns = {
+            market_id: col for col, market_id in enumerate(meta["market_ids"])
+        }
+        self.positions = np.asarray(meta["market_positions"], dtype=np.float64)
+        self.matrix = np.load(f"{path}.npy", mmap_mode="r")
+
+    def cell_index(self, origin: Coordinate) -> Optional[int]:
+        """Grid cell containing origin, or None outside the grid"""
+        row = int((origin[0] - self.lat_min) // self.cell_size)
+        col = int((origin[1] - self.lng_min) // self.cell_size)
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        return row * self.cols + col
+
+    def distances(self, origin: Coordinate, markets: Sequence) -> List[Optional[float]]:
+        cell = self.cell_index(origin)
+        if cell is None:
+            return [None] * len(markets)
+
+        row = self.matrix[cell]
+        distances = []
+        for market in markets:
+            col = self.columns.get(market.id)
+            if col is None or self._moved(market, col) or np.isnan(row[col]):
+                distances.append(None)
+            else:
+                distances.append(float(row[col]))
+        return distances
+
+    def _moved(self, market, col: int) -> bool:
+        """Whether a market left the position its column was built for"""
+        latitude, longitude = self.positions[col]
+        return (
+            abs(market.latitude - latitude) > POSITION_TOLERANCE_DEGREES
+            or abs(market.longitude - longitude) > POSITION_TOLERANCE_DEGREES
+        )
+
+
+def build_distance_matrix(
+    client: OSRMClient,
+    markets: Sequence,
+    path: str,
+    cell_size: float,
+    chunk: int = OSRM_MAX_TABLE_DESTINATIONS,
+    retries: int = 2,
+    backoff: float = 1.0,
+) -> Dict[str, int]:
+    """Build a grid-cell x market distance matrix over the markets' bounding box
+
+    Each cell centre is routed to every market with OSRM Table requests of at
+    most `chunk` destinations, each retried up to `retries` times. Distances
+    OSRM cannot answer are stored as NaN. Returns counts of cells, requests
+    that failed after all retries, and unknown (NaN) distances.
+    """
+    if chunk < 1:
+        raise ValueError("chunk must be at least 1")
+    lats = [market.latitude for market in markets]
+    lngs = [market.longitude for market in markets]
+    lat_min = math.floor(min(lats) / cell_size) * cell_size - cell_size
+    lng_min = math.floor(min(lngs) / cell_size) * cell_size - cell_size
+    rows = int(math.ceil((max(lats) - lat_min) / cell_size)) + 1
+    cols = int(math.ceil((max(lngs) - lng_min) / cell_size)) + 1
+
+    matrix = np.lib.format.open_memmap(
+        f"{path}.npy", mode="w+", dtype=np.float32, shape=(rows * cols, len(markets))
+    )
+    destinations = list(zip(lats, lngs))
+    failed_requests = unknown = 0
+    for row in range(rows):
+        for col in range(cols):
+            centre = (
+                lat_min + (row + 0.5) * cell_size,
+                lng_min + (col + 0.5) * cell_size,
+            )
+            for start in range(0, len(destinations), chunk):
+                batch = destinations[start : start + chunk]
+                values = _table_with_retries(client, centre, batch, retries, backoff)
+                if values is None:
+                    failed_requests += 1
+                    values = [None] * len(batch)
+                unknown += sum(value is None for value in values)
+                matrix[row * cols + col, start : start + len(values)] = [
+                    np.nan if value is None else value for value in values
+                ]
+        logger.info(f"Distance matrix row {row + 1}/{rows} done")
+    matrix.flush()
+
+    with open(f"{path}.json", "w") as f:
+        json.dump(
+            {
+                "lat_min": lat_min,
+                "lng_min": lng_min,
+                "cell_size": cell_size,
+                "rows": rows,
+                "cols": cols,
+                "market_ids": [market.id for market in markets],
+                "market_positions": destinations,
+            },
+            f,
+        )
+    if failed_requests:
+        logger.warning(
+            f"Distance matrix: {failed_requests} table requests failed, "
+            f"{unknown} distances unknown"
+        )
+    return {
+        "cells": rows * cols,
+        "failed_requests": failed_requests,
+        "unknown_distances": unknown,
+    }
+
+
+def _table_with_retries(
+    client: OSRMClient,
+    origin: Coordinate,
+    destinations: Sequence[Coordinate],
+    retries: int,
+    backoff: float,
+) -> Optional[List[Optional[float]]]:
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        values = client.table_distances(origin, destinations)
+        if values is not None:
+            return values
+    return None
+
+
+_client = None
+_client_lock = threading.Lock()
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_osrm_client() -> OSRMClient:
+    """Get the shared per-process OSRM client"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OSRMClient(
+                    base_url=get_setting("OSRM_BASE_URL"),
+                    timeout=get_setting("OSRM_TIMEOUT"),
+                    max_concurrency=get_setting("OSRM_MAX_CONCURRENCY"),
+                    deadline=get_setting("OSRM_DEADLINE"),
+                    ranking_mode=get_setting("OSRM_RANKING_MODE"),
+                    breaker=CircuitBreaker(
+                        failure_threshold=get_setting("OSRM_BREAKER_FAILURES"),
+                        cooldown=get_setting("OSRM_BREAKER_COOLDOWN"),
+                        latency_budget=get_setting("OSRM_LATENCY_BUDGET"),
+                    ),
+                )
+    return _client
+
+
+def create_matrix_client() -> OSRMClient:
+    """OSRM client for offline matrix builds
+
+    Bypasses the request-path circuit breaker and latency budget; the
+    builder retries failed requests itself. Close it when done.
+    """
+    timeout = get_setting("ROUTING_MATRIX_TIMEOUT")
+    return OSRMClient(
+        base_url=get_setting("OSRM_BASE_URL"),
+        timeout=timeout,
+        max_concurrency=1,
+        deadline=timeout,
+        breaker=DisabledBreaker(),
+    )
+
+
+def create_routing_provider(name: str) -> RoutingProvider:
+    """Create a routing provider by name"""
+    if name == "osrm":
+        return OSRMRoutingProvider(get_osrm_client())
+    if name == "haversine":
+        return HaversineRoutingProvider()
+    if name == "matrix":
+        path = get_setting("ROUTING_MATRIX_PATH")
+        if not path and has_app_context():
+            path = os.path.join(current_app.instance_path, "route_matrix")
+        return MatrixRoutingProvider(path)
+    raise ValueError(f"Unknown routing provider: {name}")
+
+
+def get_routing_provider() -> RoutingProvider:
+    """Get the shared routing provider selected by ROUTING_PROVIDER"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                name = get_setting("ROUTING_PROVIDER")
+                try:
+                    _provider = create_routing_provider(name)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(
+                        f"Routing provider '{name}' unavailable ({str(e)}), "
+                        "using Haversine"
+                    )
+                    _provider = HaversineRoutingProvider()
+                logger.info(f"Using routing provider: {_provider.name}")
+    return _provider
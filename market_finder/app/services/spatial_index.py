@@ -0,0 +1,270 @@
+import heapq
+import math
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.services.catalogue import on_catalogue_change, sync_catalogue
+from app.services.distance import EARTH_RADIUS_KM
+from app.services.market_snapshot import get_market_snapshot
+from app.logging import get_logger
+
+# Setup logging
+logger = get_logger(__name__)
+
+
+def to_unit_vectors(latitudes, longitudes) -> np.ndarray:
+    """Convert degree coordinates to 3D unit vectors on the sphere"""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lng = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    """Convert straight-line chord length on the unit sphere to great-circle km"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+class _KDTree:
+    """Static array-backed KD-tree over 3D points"""
+
+    LEAF_SIZE = 16
+
+    def __init__(self, points: np.ndarray):
+        self.points = points
+        self.order = np.arange(len(points))
+
+        # Node arrays (index = node id)
+        starts, ends, lefts, rights, mins, maxs = [], [], [], [], [], []
+
+        if len(points):
+            stack = [(0, len(points), -1, False)]
+            while stack:
+                start, end, parent, is_right = stack.pop()
+                node = len(starts)
+                chunk = points[self.order[start:end]]
+                starts.append(start)
+                ends.append(end)
+                lefts.append(-1)
+                rights.append(-1)
+                mins.append(chunk.min(axis=0))
+                maxs.append(chunk.max(axis=0))
+
+                if parent >= 0:
+                    (rights if is_right else lefts)[parent] = node
+
+                if end - start <= self.LEAF_SIZE:
+                    continue
+
+                # Split on widest dimension at the median
+                dim = int(np.argmax(maxs[node] - mins[node]))
+                mid = (start + end) // 2
+                segment = self.order[start:end]
+                split = np.argpartition(points[segment, dim], mid - start)
+                self.order[start:end] = segment[split]
+
+                stack.append((mid, end, node, True))
+                stack.append((start, mid, node, False))
+
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.array(ends, dtype=np.int64)
+        self.lefts = np.array(lefts, dtype=np.int64)
+        self.rights = np.array(rights, dtype=np.int64)
+        self.mins = np.array(mins).reshape(-1, 3)
+        self.maxs = np.array(maxs).reshape(-1, 3)
+
+    def _box_distance_sq(self, node: int, query: np.ndarray) -> float:
+        """Squared distance from query to node bounding box"""
+        delta = np.maximum(self.mins[node] - query, 0) + np.maximum(
+            query - self.maxs[node], 0
+        )
+        return float(delta @ delta)
+
+    def _leaf_distances_sq(self, node: int, query: np.ndarray):
+        rows = self.order[self.starts[node] : self.ends[node]]
+        delta = self.points[rows] - query
+        return rows, np.einsum("ij,ij->i", delta, delta)
+
+    def nearest(self, query: np.ndarray, k: int, skip=None) -> List[Tuple[float, int]]:
+        """Return up to k (squared chord, row) pairs closest to query"""
+        if not len(self.starts) or k <= 0:
+            return []
+
+        best = []  # max-heap of (-dist_sq, row)
+        frontier = [(0.0, 0)]
+        while frontier:
+            box_dist, node = heapq.heappop(frontier)
+            if len(best) == k and box_dist > -best[0][0]:
+                break
+
+            if self.lefts[node] < 0:
+                rows, dists = self._leaf_distances_sq(node, query)
+                for row, dist in zip(rows.tolist(), dists.tolist()):
+                    if skip and row in skip:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, row))
+                    elif dist < -best[0][0]:
+                        heapq.heapreplace(best, (-dist, row))
+                continue
+
+            for child in (self.lefts[node], self.rights[node]):
+                child_dist = self._box_distance_sq(child, query)
+                if len(best) < k or child_dist <= -best[0][0]:
+                    heapq.heappush(frontier, (child_dist, int(child)))
+
+        return sorted((-dist, row) for dist, row in best)
+
+
+class MarketSpatialIndex:
+    """In-process spatial index of active market coordinates
+
+    Coordinates are stored as 3D unit vectors so that Euclidean chord distance
+    is monotonic with great-circle distance. Writes are applied as a small
+    overlay (added/moved markets and tombstones) on top of a static KD-tree,
+    which is rebuilt once the overlay grows past REBUILD_RATIO of the tree.
+    """
+
+    REBUILD_RATIO = 0.1
+    MIN_REBUILD = 64
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = False
+        self._tree = _KDTree(np.empty((0, 3)))
+        self._tree_ids = np.empty(0, dtype=np.int64)
+        self._tree_rows: Dict[int, int] = {}
+        self._overlay: Dict[int, np.ndarray] = {}  # market id -> unit vector
+        self._tombstones = set()  # tree rows no longer valid
+
+    # ----------------------------------------------------------------- build
+    def rebuild(self, rows=None):
+        """Rebuild the tree from (id, latitude, longitude) rows or the snapshot"""
+        if rows is None:
+            snapshot = get_market_snapshot()
+            ids = np.array(snapshot.ids)
+            points = to_unit_vectors(snapshot.latitudes, snapshot.longitudes)
+        else:
+            rows = list(rows)
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            points = to_unit_vectors([row[1] for row in rows], [row[2] for row in rows])
+        points = points.reshape(-1, 3)
+        tree = _KDTree(points)
+
+        with self._lock:
+            self._tree = tree
+            self._tree_ids = ids
+            self._tree_rows = {int(market_id): row for row, market_id in enumerate(ids)}
+            self._overlay = {}
+            self._tombstones = set()
+            self._built = True
+
+        logger.info(f"Spatial index built with {len(ids)} markets")
+
+    def ensure_built(self):
+        """Build the index on first use or after another worker changed markets"""
+        sync_catalogue()
+        if not self._built:
+            self.rebuild()
+
+    def invalidate(self):
+        """Drop the index so it is rebuilt on next use"""
+        with self._lock:
+            self._built = False
+
+    def __len__(self):
+        return len(self._tree_ids) - len(self._tombstones) + len(self._overlay)
+
+    # ----------------------------------------------------------------- patch
+    def upsert(self, market_id: int, latitude: float, longitude: float):
+        """Insert or move a market"""
+        if not self._built:
+            return
+        point = to_unit_vectors([latitude], [longitude])[0]
+        with self._lock:
+            row = self._tree_rows.get(market_id)
+            if row is not None:
+                self._tombstones.add(row)
+            self._overlay[market_id] = point
+        self._maybe_rebuild()
+
+    def remove(self, market_id: int):
+        """Remove a market (deleted, deactivated or without coordinates)"""
+        if not self._built:
+            return
+        with self._lock:
+            row = self._tree_rows.get(market_id)
+            if row is not None:
+                self._tombstones.add(row)
+            self._overlay.pop(market_id, None)
+        self._maybe_rebuild()
+
+    def sync_market(self, market):
+        """Apply a market's current state to the index"""
+        if (
+            market.is_active
+            and market.latitude is not None
+            and market.longitude is not None
+        ):
+            self.upsert(market.id, market.latitude, market.longitude)
+        else:
+            self.remove(market.id)
+
+    def _maybe_rebuild(self):
+        pending = len(self._overlay) + len(self._tombstones)
+        threshold = max(self.MIN_REBUILD, len(self._tree_ids) * self.REBUILD_RATIO)
+        if pending <= threshold:
+            return
+
+        with self._lock:
+            live = [
+                (int(market_id), row)
+                for row, market_id in enumerate(self._tree_ids)
+                if row not in self._tombstones
+            ]
+            ids = [market_id for market_id, _ in live] + list(self._overlay)
+            points = np.vstack(
+                [self._tree.points[[row for _, row in live]].reshape(-1, 3)]
+                + [point.reshape(1, 3) for point in self._overlay.values()]
+            )
+            self._tree = _KDTree(points)
+            self._tree_ids = np.array(ids, dtype=np.int64)
+            self._tree_rows = {market_id: row for row, market_id in enumerate(ids)}
+            self._overlay = {}
+            self._tombstones = set()
+
+        logger.debug(f"Spatial index compacted to {len(ids)} markets")
+
+    # ----------------------------------------------------------------- query
+    def nearest(
+        self, latitude: float, longitude: float, k: int
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (market_id, distance_km) pairs ordered by distance"""
+        self.ensure_built()
+        query = to_unit_vectors([latitude], [longitude])[0]
+
+        with self._lock:
+            tree, ids = self._tree, self._tree_ids
+            tombstones = set(self._tombstones)
+            overlay = dict(self._overlay)
+
+        candidates = [
+            (dist_sq, int(ids[row]))
+            for dist_sq, row in tree.nearest(query, k, skip=tombstones)
+        ]
+        for market_id, point in overlay.items():
+            delta = point - query
+            candidates.append((float(delta @ delta), market_id))
+
+        candidates.sort()
+        return [
+            (market_id, float(chord_to_km(math.sqrt(dist_sq))))
+            for dist_sq, market_id in candidates[:k]
+        ]
+
+
+# Shared per-process index
+market_index = MarketSpatialIndex()
+on_catalogue_change(market_index.invalidate)
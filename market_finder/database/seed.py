@@ -6,6 +6,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import create_app, db
 from app.models.market import Market
+from app.services.grid import market_grid
 
 
 def seed_markets():
@@ -195,6 +196,7 @@ def seed_markets():
     for market_data in markets_data:
         try:
             market = Market(**market_data)
+            market.grid_cell = market_grid().cell(market.latitude, market.longitude)
             db.session.add(market)
             markets_added += 1
             print(f"➕ Added: {market_data['name']}")
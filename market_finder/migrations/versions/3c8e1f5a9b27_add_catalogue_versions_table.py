@@ -0,0 +1,30 @@
+"""add catalogue versions table
+
+Revision ID: 3c8e1f5a9b27
+Revises: f0d217aa984c
+Create Date: 2026-10-16 10:12:31.408215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8e1f5a9b27'
+down_revision = 'f0d217aa984c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalogue_versions = op.create_table('catalogue_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(catalogue_versions, [{'name': 'markets', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('catalogue_versions')
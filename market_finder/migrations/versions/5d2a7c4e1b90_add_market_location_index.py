@@ -0,0 +1,26 @@
+"""add market location index
+
+Revision ID: 5d2a7c4e1b90
+Revises: 3c8e1f5a9b27
+Create Date: 2026-10-16 23:52:08.173604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a7c4e1b90'
+down_revision = '3c8e1f5a9b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('markets', schema=None) as batch_op:
+        batch_op.create_index('ix_markets_active_location', ['is_active', 'latitude', 'longitude'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('markets', schema=None) as batch_op:
+        batch_op.drop_index('ix_markets_active_location')
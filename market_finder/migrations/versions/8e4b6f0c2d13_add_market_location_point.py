@@ -0,0 +1,36 @@
+"""add market location point
+
+Revision ID: 8e4b6f0c2d13
+Revises: 5d2a7c4e1b90
+Create Date: 2026-10-17 00:14:42.518330
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4b6f0c2d13'
+down_revision = '5d2a7c4e1b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # MySQL only: other backends use the latitude/longitude bounding box index
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    # SRID 4326 points are (latitude, longitude); SPATIAL indexes need NOT NULL
+    op.execute(
+        "ALTER TABLE markets ADD COLUMN location_point POINT "
+        "GENERATED ALWAYS AS (ST_SRID(POINT(COALESCE(latitude, 0), "
+        "COALESCE(longitude, 0)), 4326)) STORED NOT NULL SRID 4326"
+    )
+    op.execute("CREATE SPATIAL INDEX ix_markets_location_point ON markets (location_point)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    op.execute("DROP INDEX ix_markets_location_point ON markets")
+    op.execute("ALTER TABLE markets DROP COLUMN location_point")
@@ -0,0 +1,70 @@
+"""add market grid cell
+
+Revision ID: a7c31d9e5f48
+Revises: 8e4b6f0c2d13
+Create Date: 2026-10-17 00:41:19.062875
+
+"""
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c31d9e5f48'
+down_revision = '8e4b6f0c2d13'
+branch_labels = None
+depends_on = None
+
+
+# Cell layout at this revision: row-major 0.05 degree cells from (-90, -180).
+# After changing GRID_CELL_DEGREES run `flask markets backfill-grid` instead.
+CELL_DEGREES = 0.05
+ROWS = math.ceil(180 / CELL_DEGREES)
+COLS = math.ceil(360 / CELL_DEGREES)
+
+
+def grid_cell(latitude, longitude):
+    row = min(max(int((latitude + 90) // CELL_DEGREES), 0), ROWS - 1)
+    col = int((longitude + 180) // CELL_DEGREES) % COLS
+    return row * COLS + col
+
+
+markets = sa.table(
+    'markets',
+    sa.column('id', sa.Integer()),
+    sa.column('latitude', sa.Float()),
+    sa.column('longitude', sa.Float()),
+    sa.column('grid_cell', sa.Integer()),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('markets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('grid_cell', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_markets_grid_cell'), ['grid_cell'], unique=False)
+
+    # Assign cells to existing markets so grid lookups find them
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(markets.c.id, markets.c.latitude, markets.c.longitude).where(
+            markets.c.latitude.isnot(None), markets.c.longitude.isnot(None)
+        )
+    ).all()
+    if rows:
+        bind.execute(
+            markets.update()
+            .where(markets.c.id == sa.bindparam('market_id'))
+            .values(grid_cell=sa.bindparam('cell')),
+            [
+                {'market_id': market_id, 'cell': grid_cell(latitude, longitude)}
+                for market_id, latitude, longitude in rows
+            ],
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('markets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_markets_grid_cell'))
+        batch_op.drop_column('grid_cell')
@@ -0,0 +1,33 @@
+"""add market positions catalogue
+
+Revision ID: c5e9a2f7d361
+Revises: a7c31d9e5f48
+Create Date: 2026-10-17 09:26:51.774102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e9a2f7d361'
+down_revision = 'a7c31d9e5f48'
+branch_labels = None
+depends_on = None
+
+
+catalogue_versions = sa.table(
+    'catalogue_versions',
+    sa.column('name', sa.String(length=50)),
+    sa.column('version', sa.Integer()),
+)
+
+
+def upgrade():
+    op.bulk_insert(catalogue_versions, [{'name': 'market_positions', 'version': 0}])
+
+
+def downgrade():
+    op.execute(
+        catalogue_versions.delete().where(catalogue_versions.c.name == 'market_positions')
+    )
@@ -0,0 +1,24 @@
+"""
+Shared fixtures for the test suite
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+
+
+@pytest.fixture
+def app():
+    """Testing app with a fresh in-memory database"""
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
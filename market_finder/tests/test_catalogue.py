@@ -0,0 +1,148 @@
+"""
+Tests for catalogue versioning across workers
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db
+from app.ga.market_finder import GAConfig, find_nearby_markets
+from app.services import catalogue, route_cache, routing
+from app.services.catalogue import (
+    CATALOGUE_NAME,
+    POSITIONS_NAME,
+    bump_catalogue_version,
+    get_catalogue_versions,
+    mark_catalogue_seen,
+    on_catalogue_change,
+    sync_catalogue,
+)
+from app.services.market import MarketService
+from app.services.route_cache import RouteDistanceCache, _clear_route_cache
+from app.services.routing import OSRMRoutingProvider
+
+
+@pytest.fixture
+def drops(monkeypatch):
+    """Fresh worker state with one recording listener per catalogue"""
+    monkeypatch.setattr(catalogue, "_listeners", {})
+    monkeypatch.setattr(catalogue, "_seen_versions", {})
+    dropped = []
+    on_catalogue_change(lambda: dropped.append(CATALOGUE_NAME))
+    on_catalogue_change(lambda: dropped.append(POSITIONS_NAME), POSITIONS_NAME)
+    return dropped
+
+
+def _other_worker_bumps(*names):
+    bump_catalogue_version(*names)
+    db.session.commit()
+
+
+def test_bump_creates_and_increments_versions(app):
+    assert get_catalogue_versions() == {}
+    assert bump_catalogue_version() == {CATALOGUE_NAME: 1}
+    assert bump_catalogue_version(CATALOGUE_NAME, POSITIONS_NAME) == {
+        CATALOGUE_NAME: 2,
+        POSITIONS_NAME: 1,
+    }
+    db.session.commit()
+    assert get_catalogue_versions() == {CATALOGUE_NAME: 2, POSITIONS_NAME: 1}
+
+
+def test_first_sync_keeps_caches_and_later_bumps_drop_them(app, drops):
+    _other_worker_bumps()
+    sync_catalogue()
+    assert drops == []  # nothing was cached against an older version
+
+    _other_worker_bumps()
+    sync_catalogue()
+    assert drops == [CATALOGUE_NAME]  # positions catalogue unchanged
+
+    _other_worker_bumps(POSITIONS_NAME)
+    sync_catalogue()
+    sync_catalogue()
+    assert drops == [CATALOGUE_NAME, POSITIONS_NAME]
+
+
+def test_own_write_is_not_treated_as_stale(app, drops):
+    sync_catalogue()
+    versions = bump_catalogue_version(CATALOGUE_NAME, POSITIONS_NAME)
+    db.session.commit()
+    mark_catalogue_seen(versions)
+    sync_catalogue()
+    assert drops == []
+
+    # Another worker wrote in between: our own bump must not hide it
+    _other_worker_bumps()
+    versions = bump_catalogue_version()
+    db.session.commit()
+    mark_catalogue_seen(versions)
+    sync_catalogue()
+    assert drops == [CATALOGUE_NAME]
+
+
+def test_only_cached_fields_bump_the_catalogue(app, monkeypatch):
+    monkeypatch.setattr(MarketService, "_invalidate_routes", lambda market_id: None)
+    market = MarketService.create_market(
+        {"name": "Pasar", "location": "x", "latitude": -6.2, "longitude": 106.8}
+    )
+    created = get_catalogue_versions()
+    assert created == {CATALOGUE_NAME: 1}
+
+    MarketService.update_market(market.id, {"description": "New stalls"})
+    assert get_catalogue_versions() == created
+
+    MarketService.update_market(market.id, {"category": "modern"})
+    assert get_catalogue_versions() == {CATALOGUE_NAME: 2}
+
+    MarketService.update_market(market.id, {"latitude": -6.3})
+    assert get_catalogue_versions() == {CATALOGUE_NAME: 3, POSITIONS_NAME: 1}
+
+    MarketService.delete_market(market.id)
+    assert get_catalogue_versions() == {CATALOGUE_NAME: 4, POSITIONS_NAME: 2}
+
+
+class CountingOSRMClient:
+    """Answers every route with the number of OSRM requests made so far"""
+
+    def __init__(self):
+        self.requests = 0
+
+    def ranking_distances(self, origin, destinations):
+        self.requests += 1
+        return [float(self.requests)] * len(destinations)
+
+
+def test_database_nearest_drops_routes_another_worker_moved(app, monkeypatch):
+    monkeypatch.setattr(catalogue, "_listeners", {})
+    monkeypatch.setattr(catalogue, "_seen_versions", {})
+    on_catalogue_change(_clear_route_cache, POSITIONS_NAME)
+    monkeypatch.setattr(route_cache, "_cache", RouteDistanceCache())
+    monkeypatch.setattr(routing, "get_route_store", lambda: None)
+    client = CountingOSRMClient()
+    monkeypatch.setattr(routing, "_provider", OSRMRoutingProvider(client))
+    app.config["NEAREST_BACKEND"] = "database"
+    market = MarketService.create_market(
+        {"name": "Pasar", "location": "x", "latitude": -6.2, "longitude": 106.8}
+    )
+    config = GAConfig()
+    config.OBJECTIVE = "distance"
+
+    def nearest_distance():
+        return find_nearby_markets(-6.2, 106.8, 1, config)[0]["distance"]
+
+    assert nearest_distance() == 1.0
+    assert nearest_distance() == 1.0  # Served from this worker's route cache
+    assert client.requests == 1
+
+    # Another worker moves the market
+    market.latitude = -6.25
+    _other_worker_bumps(CATALOGUE_NAME, POSITIONS_NAME)
+
+    assert nearest_distance() == 2.0
+    assert client.requests == 2
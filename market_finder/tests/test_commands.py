@@ -0,0 +1,100 @@
+"""
+Tests for Flask CLI maintenance commands
+"""
+
+import os
+import sys
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import commands, db
+from app.models.market import Market
+from app.services.grid import market_grid
+
+
+class FakeTableClient:
+    def __init__(self, answer):
+        self.answer = answer
+        self.closed = False
+
+    def table_distances(self, origin, destinations):
+        return self.answer(destinations)
+
+    def close(self):
+        self.closed = True
+
+
+def _build_matrix(app, monkeypatch, tmp_path, answer):
+    db.session.add_all(
+        [
+            Market(name="A", location="x", latitude=0.1, longitude=0.1),
+            Market(name="B", location="x", latitude=0.2, longitude=0.3),
+        ]
+    )
+    db.session.commit()
+    client = FakeTableClient(answer)
+    monkeypatch.setattr(commands, "create_matrix_client", lambda: client)
+    result = app.test_cli_runner().invoke(
+        args=[
+            "routing",
+            "build-matrix",
+            "--output",
+            str(tmp_path / "matrix"),
+            "--cell-size",
+            "0.5",
+            "--retries",
+            "0",
+        ]
+    )
+    assert client.closed
+    return result
+
+
+def test_build_matrix_succeeds_and_warns_on_unreachable(app, monkeypatch, tmp_path):
+    result = _build_matrix(app, monkeypatch, tmp_path, lambda destinations: [1.0, None])
+    assert result.exit_code == 0, result.output
+    assert "Wrote" in result.output and "unreachable" in result.output
+
+
+def test_build_matrix_fails_when_requests_fail(app, monkeypatch, tmp_path):
+    result = _build_matrix(app, monkeypatch, tmp_path, lambda destinations: None)
+    assert result.exit_code != 0
+    assert "table requests failed" in result.output
+
+
+def test_backfill_grid_assigns_missing_and_stale_cells(app):
+    grid = market_grid()
+    db.session.add_all(
+        [
+            Market(name="A", location="x", latitude=0.1, longitude=0.1),
+            Market(name="B", location="x", latitude=0.2, longitude=0.3, grid_cell=1),
+            Market(
+                name="C",
+                location="x",
+                latitude=-6.2,
+                longitude=106.8,
+                grid_cell=grid.cell(-6.2, 106.8),
+            ),
+            Market(name="D", location="x"),
+        ]
+    )
+    db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["markets", "backfill-grid", "--batch-size", "1"])
+    assert result.exit_code == 0, result.output
+    assert "Updated 2 of 4 markets" in result.output
+
+    db.session.expire_all()
+    cells = {market.name: market.grid_cell for market in Market.query}
+    assert cells == {
+        "A": grid.cell(0.1, 0.1),
+        "B": grid.cell(0.2, 0.3),
+        "C": grid.cell(-6.2, 106.8),
+        "D": None,
+    }
+
+    # Nothing left to change
+    result = runner.invoke(args=["markets", "backfill-grid"])
+    assert "Updated 0 of 4 markets" in result.output
@@ -0,0 +1,64 @@
+"""
+Tests for the Haversine distance kernel
+"""
+
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.distance import DistanceKernel, bounding_box, haversine_km
+
+
+def _points(count, seed=3):
+    rng = random.Random(seed)
+    return [
+        (-6.2 + rng.uniform(-2, 2), 106.8 + rng.uniform(-2, 2)) for _ in range(count)
+    ]
+
+
+def test_kernel_matches_scalar_haversine():
+    points = _points(100) + [(-6.2088, 106.8456)]  # includes the origin itself
+    kernel = DistanceKernel.from_coordinates(*zip(*points))
+
+    distances = kernel.distances_from(-6.2088, 106.8456)
+    expected = [haversine_km(-6.2088, 106.8456, lat, lng) for lat, lng in points]
+    assert distances == pytest.approx(expected, abs=1e-6)
+    assert distances[-1] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_many_origins_match_single_origin_rows():
+    kernel = DistanceKernel.from_coordinates(*zip(*_points(50)))
+    origins = _points(4, seed=8)
+
+    matrix = kernel.distances_from_many(*zip(*origins))
+    assert matrix.shape == (4, 50)
+    for row, origin in zip(matrix, origins):
+        np.testing.assert_allclose(row, kernel.distances_from(*origin))
+    assert not kernel.sin_lat.flags.writeable
+
+
+@pytest.mark.parametrize(
+    "latitude, longitude, radius_km",
+    [(-6.2088, 106.8456, 25), (60.0, 10.0, 300), (0.0, 179.9, 50)],
+)
+def test_bounding_box_encloses_radius(latitude, longitude, radius_km):
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    spread = 2 * radius_km / 111
+    rng = random.Random(4)
+    for _ in range(500):
+        lat = latitude + rng.uniform(-spread, spread)
+        lng = longitude + rng.uniform(-3 * spread, 3 * spread)
+        if haversine_km(latitude, longitude, lat, lng) > radius_km:
+            continue
+        assert min_lat <= lat <= max_lat
+        assert min_lng <= lng <= max_lng
+
+
+def test_bounding_box_spans_all_longitudes_at_poles():
+    assert bounding_box(89.9, 0.0, 50)[2:] == (None, None)
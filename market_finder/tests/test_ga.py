@@ -0,0 +1,287 @@
+"""
+Tests for the Market GA engine
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.config import Config
+from app.ga import market_finder
+from app.ga.islands import get_island_pool, migrate
+from app.ga.market_finder import TOOLBOX, GAConfig, GAContext, MarketGA
+from app.ga.reports import submit_convergence_report
+from app.services.distance import haversine_km
+from app.services.market_snapshot import MarketSnapshot
+
+
+def _make_snapshot(count, seed=7):
+    rng = random.Random(seed)
+    return MarketSnapshot.from_rows(
+        (
+            i + 1,
+            -6.2 + rng.uniform(-0.5, 0.5),
+            106.8 + rng.uniform(-0.5, 0.5),
+            rng.choice(["tradisional", "modern", "umum"]),
+        )
+        for i in range(count)
+    )
+
+
+@pytest.mark.parametrize("chromosome", ["index_set", "bitlist"])
+@pytest.mark.parametrize("objective", ["distance", "category_mix"])
+def test_vectorized_evaluation_matches_per_individual(
+    monkeypatch, objective, chromosome
+):
+    monkeypatch.setattr(GAConfig, "OBJECTIVE", objective)
+    monkeypatch.setattr(GAConfig, "CHROMOSOME", chromosome)
+    ctx = GAContext(-6.2088, 106.8456, _make_snapshot(40), target_count=3, seed=1)
+    population = TOOLBOX.population(ctx, 20)
+    if chromosome == "index_set":
+        population.append([0, 1, 2, 3, 4])  # wrong count, penalised
+        population.append([])  # empty selection
+    else:
+        population.append([1] * 5 + [0] * 35)
+        population.append([0] * 40)
+
+    vectorized = TOOLBOX.evaluate_population(ctx, population)
+    for individual, (fitness,) in zip(population, vectorized):
+        (expected,) = TOOLBOX.evaluate(ctx, individual)
+        assert fitness == pytest.approx(expected)
+
+
+def test_select_top_k_matches_full_sort():
+    ga = MarketGA(-6.2088, 106.8456)
+    ga.snapshot = _make_snapshot(200)
+
+    snapshot = ga.snapshot
+    expected = sorted(
+        range(len(snapshot)),
+        key=lambda row: haversine_km(
+            ga.target_lat,
+            ga.target_lng,
+            snapshot.latitudes[row],
+            snapshot.longitudes[row],
+        ),
+    )
+    assert ga._select_top_k(5) == snapshot.ids_at(expected[:5])
+
+
+def test_index_set_operators_preserve_count(monkeypatch):
+    monkeypatch.setattr(GAConfig, "CHROMOSOME", "index_set")
+    ctx = GAContext(-6.2088, 106.8456, _make_snapshot(50), target_count=4, seed=3)
+    for _ in range(200):
+        parent1, parent2 = TOOLBOX.individual(ctx), TOOLBOX.individual(ctx)
+        union = set(parent1) | set(parent2)
+        child1, child2 = TOOLBOX.mate(ctx, parent1, parent2)
+        assert set(child1) | set(child2) == union
+        (mutant,) = TOOLBOX.mutate(ctx, child1)
+        for individual in (mutant, child2):
+            assert len(set(individual)) == len(individual) == 4
+            assert all(0 <= row < 50 for row in individual)
+
+
+def test_index_set_diversity_matches_bitlist():
+    ctx = GAContext(-6.2088, 106.8456, _make_snapshot(30))
+    rng = random.Random(9)
+    index_sets = [sorted(rng.sample(range(30), 3)) for _ in range(25)]
+    bitlists = [[int(row in rows) for row in range(30)] for rows in index_sets]
+
+    ctx.config.CHROMOSOME = "bitlist"
+    expected = ctx.calculate_diversity(bitlists)
+    ctx.config.CHROMOSOME = "index_set"
+    assert ctx.calculate_diversity(index_sets) == pytest.approx(expected)
+
+
+def test_diversity_matches_pairwise_hamming(monkeypatch):
+    monkeypatch.setattr(GAConfig, "CHROMOSOME", "bitlist")
+    ctx = GAContext(-6.2088, 106.8456, _make_snapshot(30))
+    rng = random.Random(5)
+    population = [[rng.randint(0, 1) for _ in range(30)] for _ in range(25)]
+
+    pairs = [
+        sum(a != b for a, b in zip(population[i], population[j]))
+        for i in range(len(population))
+        for j in range(i + 1, len(population))
+    ]
+    expected = sum(pairs) / len(pairs) / 30
+    assert ctx.calculate_diversity(population) == pytest.approx(expected)
+
+
+def test_evaluation_skips_valid_and_memoised_individuals():
+    ctx = GAContext(-6.2088, 106.8456, _make_snapshot(30), target_count=3, seed=6)
+    ctx.config.FITNESS_CACHE_SIZE = 2
+    first, second = TOOLBOX.individual(ctx), TOOLBOX.individual(ctx)
+    population = [first, TOOLBOX.clone(first), second]
+
+    assert ctx.evaluate(population) == 2  # duplicate selection evaluated once
+    assert ctx.evaluate(population) == 0  # all fitness values still valid
+    assert ctx.cache_lookups == 3 and ctx.cache_hits == 0
+
+    clone = TOOLBOX.clone(second)
+    del clone.fitness.values
+    assert ctx.evaluate([clone]) == 0  # served from the memo
+    assert clone.fitness.values == second.fitness.values
+    assert ctx.cache_hits == 1
+
+    third = TOOLBOX.individual(ctx)
+    ctx.evaluate([third])
+    assert len(ctx.fitness_cache) == 2  # bounded, least recently used dropped
+    assert frozenset(first) not in ctx.fitness_cache
+
+
+def test_concurrent_runs_share_types_but_not_state():
+    snapshot = _make_snapshot(60)
+
+    def run(seed):
+        ga = MarketGA(-6.2088, 106.8456)
+        ga.snapshot = snapshot
+        return ga._run_ga(target_count=3, seed=seed)
+
+    expected = [run(seed) for seed in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(run, range(4))) == expected
+
+
+def test_convergence_report_is_opt_in(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "GA_REPORTS_DIR", str(tmp_path))
+    history = ([3.0, 2.0, 1.5], [4.0, 3.0, 2.0], [0.4, 0.3, 0.2])
+
+    monkeypatch.setattr(Config, "GA_REPORTS_ENABLED", False)
+    assert submit_convergence_report(*history) is None
+
+    monkeypatch.setattr(Config, "GA_REPORTS_ENABLED", True)
+    first = submit_convergence_report(*history).result(timeout=30)
+    second = submit_convergence_report(*history).result(timeout=30)
+    assert first != second  # one file per run
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [os.path.basename(first), os.path.basename(second)]
+    )
+
+
+def test_telemetry_is_one_sampled_record(monkeypatch):
+    records = []
+    monkeypatch.setattr(market_finder.logger, "info", records.append)
+    monkeypatch.setattr(GAConfig, "GENERATIONS", 5)
+    ga = MarketGA(-6.2088, 106.8456)
+    ga.snapshot = _make_snapshot(40)
+
+    ga._run_ga(target_count=3, seed=1)
+    assert len(records) == 1
+    telemetry = json.loads(records[0].split(": ", 1)[1])
+    assert telemetry["generations"] == 5
+    population_size = telemetry["population_size"]
+    assert population_size <= telemetry["evaluations"] < 5 * population_size
+    assert telemetry["fitness_cache_hit_rate"] > 0
+    assert set(telemetry["phase_seconds"]) >= {"evaluation", "total"}
+    assert "generation_detail" not in telemetry
+
+    monkeypatch.setattr(Config, "GA_TELEMETRY_SAMPLE_RATE", 0.0)
+    ga._run_ga(target_count=3, seed=1)
+    assert len(records) == 1
+
+    monkeypatch.setattr(Config, "GA_TELEMETRY_DEBUG", True)
+    ga._run_ga(target_count=3, seed=1)
+    telemetry = json.loads(records[1].split(": ", 1)[1])
+    assert len(telemetry["generation_detail"]) == 5
+
+
+def test_island_model_runs_in_worker_processes():
+    config = GAConfig(
+        OBJECTIVE="category_mix", ISLANDS=2, MIGRATION_INTERVAL=5, GENERATIONS=21
+    )
+    ga = MarketGA(-6.2088, 106.8456, config)
+    ga.snapshot = _make_snapshot(80)
+
+    best = ga._run_ga(target_count=3, seed=4)
+    assert len(set(best)) == 3 and all(0 <= row < 80 for row in best)
+    assert ga.telemetry.islands == 2
+    assert ga.telemetry.generations in range(6, 22, 5)  # tracked per migration
+    assert best.fitness.values == TOOLBOX.evaluate(ga.context, best)
+
+    # Same seed, same answer regardless of worker scheduling
+    assert ga._run_ga(target_count=3, seed=4) == best
+
+
+def test_island_pools_are_sized_per_worker_count():
+    assert get_island_pool(2) is get_island_pool(2)
+    assert get_island_pool(3) is not get_island_pool(2)
+    assert get_island_pool(3)._max_workers == 3
+
+
+def test_migration_replaces_worst_with_neighbours_best():
+    ctx = GAContext(-6.2088, 106.8456, _make_snapshot(30), target_count=3, seed=2)
+    islands = [TOOLBOX.population(ctx, 6) for _ in range(3)]
+    for island in islands:
+        ctx.evaluate(island)
+    best = [sorted(island, key=lambda ind: ind.fitness)[-1] for island in islands]
+
+    migrate(islands, 1)
+    for source, elite in enumerate(best):
+        target = islands[(source + 1) % 3]
+        assert any(ind == elite and ind is not elite for ind in target)
+        assert len(target) == 6
+
+
+def test_config_is_sized_to_catalogue_and_capped():
+    small = GAConfig().sized_for(market_count=40, target_count=3)
+    large = GAConfig().sized_for(market_count=100000, target_count=3)
+    assert small.POPULATION_SIZE < large.POPULATION_SIZE == 100
+    assert small.GENERATIONS < large.GENERATIONS == 100
+    assert GAConfig(ADAPTIVE_SIZING=False).sized_for(40, 3).POPULATION_SIZE == 100
+
+
+def test_time_budget_returns_best_so_far():
+    config = GAConfig(
+        OBJECTIVE="category_mix",
+        ADAPTIVE_SIZING=False,
+        GENERATIONS=10000,
+        STAGNATION_LIMIT=10000,
+        TIME_BUDGET_MS=50,
+    )
+    ga = MarketGA(-6.2088, 106.8456, config)
+    ga.snapshot = _make_snapshot(200)
+
+    started = time.perf_counter()
+    best = ga._run_ga(target_count=3, seed=1)
+    assert time.perf_counter() - started < 1.0
+    assert ga.telemetry.budget_exhausted
+    assert 0 < ga.telemetry.generations < 10000
+    assert len(best) == 3
+
+
+def test_ranking_falls_back_to_haversine_where_routing_fails(monkeypatch):
+    class PartialProvider:
+        name = "partial"
+
+        def distances(self, origin, markets):
+            return [None if market.id % 2 else 1.0 for market in markets]
+
+    monkeypatch.setattr(market_finder, "get_routing_provider", PartialProvider)
+    markets = [
+        SimpleNamespace(
+            id=i, name=f"Pasar {i}", latitude=-6.2 + i * 0.01, longitude=106.8
+        )
+        for i in range(1, 5)
+    ]
+    ga = MarketGA(-6.2, 106.8)
+
+    ranked = ga._rank_with_osrm(markets, len(markets))
+
+    distances = {result["market"].id: result["distance"] for result in ranked}
+    assert distances[2] == distances[4] == 1.0
+    for market_id in (1, 3):
+        market = markets[market_id - 1]
+        assert distances[market_id] == round(
+            haversine_km(-6.2, 106.8, market.latitude, market.longitude), 2
+        )
+    assert [result["distance"] for result in ranked] == sorted(distances.values())
@@ -0,0 +1,62 @@
+"""
+Tests for grid-cell neighbourhood lookups
+"""
+
+import math
+import os
+import random
+import sys
+
+import pytest
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.distance import haversine_km
+from app.services.grid import Grid
+
+
+@pytest.mark.parametrize(
+    "latitude, longitude", [(-6.2088, 106.8456), (64.1, -21.9), (0.01, 179.99)]
+)
+def test_covered_distance_is_a_lower_bound_outside_the_rings(latitude, longitude):
+    grid = Grid(0.1)
+    row, col = grid.position(latitude, longitude)
+    rng = random.Random(2)
+    for radius in range(4):
+        covered = grid.covered_km(latitude, longitude, radius)
+        inside = grid.square(row, col, radius)
+        for _ in range(300):
+            lat = latitude + rng.uniform(-1, 1)
+            lng = (longitude + rng.uniform(-1, 1) + 180) % 360 - 180
+            if grid.cell(lat, lng) not in inside:
+                assert haversine_km(latitude, longitude, lat, lng) >= covered
+
+
+def test_nearest_matches_brute_force_across_the_antimeridian():
+    grid = Grid(0.05)
+    rng = random.Random(6)
+    points = [(rng.uniform(-1, 1), rng.uniform(-180, 180)) for _ in range(100)]
+    points += [(rng.uniform(-1, 1), rng.uniform(179, 180)) for _ in range(20)]
+    points += [(rng.uniform(-1, 1), rng.uniform(-180, -179)) for _ in range(20)]
+    buckets = {}
+    for point in points:
+        buckets.setdefault(grid.cell(*point), []).append(point)
+
+    def fetch(cells):
+        return [
+            (haversine_km(0.0, 179.98, *point), point)
+            for cell in cells
+            for point in buckets.get(cell, [])
+        ]
+
+    expected = sorted((haversine_km(0.0, 179.98, *p), p) for p in points)[:5]
+    assert grid.nearest(0.0, 179.98, 5, fetch, max_rings=100) == expected
+    assert grid.nearest(0.0, 179.98, 5, fetch, max_rings=0) is None
+
+
+def test_whole_globe_search_returns_every_item():
+    grid = Grid(60)
+    found = grid.nearest(10.0, 20.0, 5, lambda cells: [(0.0, c) for c in cells], 10)
+    assert len(found) == 5
+    assert grid.covered_km(10.0, 20.0, 3) == math.inf
@@ -0,0 +1,172 @@
+"""
+Tests for location search against the database
+"""
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import text
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db
+from app.config import get_setting
+from app.ga import market_finder
+from app.ga.market_finder import GAConfig, find_nearby_markets
+from app.models.market import Market
+from app.services.distance import haversine_km
+from app.services.grid import market_grid
+from app.services import market as market_service
+from app.services.market import MarketService
+
+
+def _add_markets(points, is_active=True, with_cells=True):
+    for name, latitude, longitude in points:
+        db.session.add(
+            Market(
+                name=name,
+                location="x",
+                latitude=latitude,
+                longitude=longitude,
+                grid_cell=(
+                    market_grid().cell(latitude, longitude) if with_cells else None
+                ),
+                is_active=is_active,
+            )
+        )
+    db.session.commit()
+
+
+@pytest.mark.parametrize(
+    "radius_km, expected",
+    [(50, ["east", "west"]), (500, ["east", "west", "west far", "east far"])],
+)
+def test_location_search_wraps_the_antimeridian(app, radius_km, expected):
+    _add_markets(
+        [
+            ("west", 0, 179.6),
+            ("east", 0, -179.95),
+            ("west far", 0, 179.0),
+            ("east far", 0, -178.95),
+            ("too far", 0, 170.0),
+            ("other side", 0, 0.0),
+        ]
+    )
+    _add_markets([("closed", 0, 179.9)], is_active=False)
+
+    results = MarketService.search_markets_by_location(0, 179.9, radius_km)
+
+    assert [market["name"] for market in results] == expected
+    for market in results:
+        assert market["distance_km"] == round(
+            haversine_km(0, 179.9, market["latitude"], market["longitude"]), 2
+        )
+
+
+def test_wide_location_search_uses_the_box_query():
+    # The 500 km case above is too wide for the grid
+    grid = market_grid()
+    assert grid.cells_within(0, 179.9, 500, get_setting("GRID_MAX_CELLS")) is None
+    assert grid.cells_within(0, 179.9, 50, get_setting("GRID_MAX_CELLS")) is not None
+
+
+def test_nearest_markets_within_the_grid(app):
+    _add_markets([(f"Pasar {i}", -6.2, 106.8 + i * 0.01) for i in range(5)])
+
+    nearest = MarketService.get_nearest_markets(-6.2, 106.83, 3)
+
+    assert [market.name for _, market in nearest] == ["Pasar 3", "Pasar 2", "Pasar 4"]
+
+
+def test_nearest_markets_double_the_radius_for_a_far_origin(app, monkeypatch):
+    _add_markets([("Surabaya", -7.25, 112.75), ("Medan", 3.6, 98.7), ("Null", 0, 0)])
+    radii = []
+    markets_within = MarketService._markets_within
+
+    def record(latitude, longitude, radius_km, *args):
+        radii.append(radius_km)
+        return markets_within(latitude, longitude, radius_km, *args)
+
+    monkeypatch.setattr(MarketService, "_markets_within", record)
+
+    nearest = MarketService.get_nearest_markets(-6.2, 106.8, 2)
+
+    assert [market.name for _, market in nearest] == ["Surabaya", "Medan"]
+    assert [distance for distance, _ in nearest] == pytest.approx(
+        [
+            haversine_km(-6.2, 106.8, market.latitude, market.longitude)
+            for _, market in nearest
+        ]
+    )
+    assert len(radii) > 1
+    assert all(b == 2 * a for a, b in zip(radii, radii[1:]))
+
+    # More markets than exist: widens to the whole globe and returns them all
+    assert len(MarketService.get_nearest_markets(-6.2, 106.8, 10)) == 3
+
+
+def test_nearest_markets_across_the_pole_and_antimeridian(app):
+    _add_markets([("over the pole", 89.5, 179.0), ("south", 85.0, 0.0)])
+    _add_markets([("east", -16.5, -179.9), ("west", -16.5, 178.0)])
+
+    nearest = MarketService.get_nearest_markets(89.9, 0.0, 1)
+    assert [market.name for _, market in nearest] == ["over the pole"]
+
+    results = MarketService.search_markets_by_location(89.9, 0.0, 100)
+    assert [market["name"] for market in results] == ["over the pole"]
+
+    nearest = MarketService.get_nearest_markets(-16.5, 179.5, 2)
+    assert [market.name for _, market in nearest] == ["east", "west"]
+
+
+def test_nearest_backend_database(app, monkeypatch):
+    def unused(*args):
+        raise AssertionError("spatial index used")
+
+    monkeypatch.setattr(market_finder.market_index, "nearest", unused)
+    app.config["NEAREST_BACKEND"] = "database"
+    _add_markets([(f"Pasar {i}", -6.2 + i * 0.02, 106.8) for i in range(4)])
+
+    config = GAConfig()
+    config.OBJECTIVE = "distance"
+    results = find_nearby_markets(-6.2, 106.8, 2, config)
+
+    assert [result["market"].name for result in results] == ["Pasar 0", "Pasar 1"]
+    assert results[0]["distance"] == 0.0
+
+
+def test_markets_without_grid_cells_are_still_found(app):
+    _add_markets([("Pasar 0", -6.2, 106.8)])
+    _add_markets([("Pasar 1", -6.2, 106.81)], with_cells=False)
+    _add_markets([("no coordinates", None, None)], with_cells=False)
+
+    results = MarketService.search_markets_by_location(-6.2, 106.8, 5)
+    assert [market["name"] for market in results] == ["Pasar 0", "Pasar 1"]
+
+    nearest = MarketService.get_nearest_markets(-6.2, 106.805, 2)
+    assert sorted(market.name for _, market in nearest) == ["Pasar 0", "Pasar 1"]
+
+
+def test_location_point_column_is_checked_once(app, monkeypatch):
+    monkeypatch.setattr(market_service, "_location_point_columns", {})
+    bind = db.session.get_bind()
+    # db.create_all() leaves out the column migration 8e4b6f0c2d13 adds
+    assert not market_service._has_location_point(bind)
+
+    db.session.execute(text("ALTER TABLE markets ADD COLUMN location_point BLOB"))
+    assert not market_service._has_location_point(bind)  # Cached
+
+    monkeypatch.setattr(market_service, "_location_point_columns", {})
+    assert market_service._has_location_point(bind)
+
+
+def test_mysql_without_location_point_searches_the_grid(app, monkeypatch):
+    monkeypatch.setattr(market_service, "_location_point_columns", {})
+    monkeypatch.setattr(db.session.get_bind().dialect, "name", "mysql")
+    _add_markets([("Pasar 0", -6.2, 106.8), ("Pasar 1", -6.2, 106.81)])
+
+    results = MarketService.search_markets_by_location(-6.2, 106.8, 5)
+
+    assert [market["name"] for market in results] == ["Pasar 0", "Pasar 1"]
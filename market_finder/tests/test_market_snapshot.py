@@ -0,0 +1,68 @@
+"""
+Tests for the shared column-only market snapshot
+"""
+
+import os
+import sys
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db
+from app.models.market import Market, MarketCategory
+from app.services import catalogue, market_snapshot
+from app.services.catalogue import CATALOGUE_NAME, bump_catalogue_version
+from app.services.market_snapshot import (
+    MarketSnapshot,
+    get_market_snapshot,
+    invalidate_market_snapshot,
+)
+
+
+def _add_market(name, latitude=-6.2, longitude=106.8, **fields):
+    market = Market(
+        name=name, location="x", latitude=latitude, longitude=longitude, **fields
+    )
+    db.session.add(market)
+    db.session.commit()
+    return market
+
+
+def test_load_keeps_only_active_markets_with_coordinates(app):
+    first = _add_market("Pasar", category=MarketCategory.TRADITIONAL)
+    _add_market("closed", is_active=False)
+    _add_market("no latitude", latitude=None)
+    _add_market("no longitude", longitude=None)
+    second = _add_market("Mall", latitude=-6.3, longitude=106.9)
+
+    snapshot = MarketSnapshot.load()
+
+    assert snapshot.ids.tolist() == [first.id, second.id]
+    assert snapshot.row_by_id == {first.id: 0, second.id: 1}
+    assert snapshot.latitudes.tolist() == [-6.2, -6.3]
+    assert snapshot.longitudes.tolist() == [106.8, 106.9]
+    assert snapshot.category_labels[snapshot.categories[0]] == "tradisional"
+    assert not snapshot.ids.flags.writeable
+
+
+def test_shared_snapshot_reloads_after_invalidation(app, monkeypatch):
+    monkeypatch.setattr(market_snapshot, "_snapshot", None)
+    monkeypatch.setattr(catalogue, "_seen_versions", {})
+    first = _add_market("Pasar")
+
+    snapshot = get_market_snapshot()
+    assert snapshot.ids.tolist() == [first.id]
+    assert get_market_snapshot() is snapshot
+
+    second = _add_market("Mall")
+    assert get_market_snapshot() is snapshot  # Nothing told this worker yet
+
+    invalidate_market_snapshot()
+    reloaded = get_market_snapshot()
+    assert reloaded.ids.tolist() == [first.id, second.id]
+
+    # Another worker deactivates a market and bumps the catalogue
+    second.is_active = False
+    bump_catalogue_version(CATALOGUE_NAME)
+    db.session.commit()
+    assert get_market_snapshot().ids.tolist() == [first.id]
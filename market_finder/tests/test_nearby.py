@@ -0,0 +1,134 @@
+"""
+Tests for batch nearest-market search
+"""
+
+import json
+import os
+import random
+import sys
+
+import pytest
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db
+from app.config.config import Config
+from app.models.market import Market
+from app.services import nearby
+from app.services.distance import haversine_km
+from app.services.market import MarketService
+from app.services.market_snapshot import MarketSnapshot, invalidate_market_snapshot
+from app.services.nearby import nearest_rows
+
+
+@pytest.fixture
+def app(app):
+    """Testing app with five markets along one parallel"""
+    db.session.add_all(
+        Market(name=f"Pasar {i}", location="x", latitude=-6.2, longitude=106.8 + i)
+        for i in range(5)
+    )
+    db.session.commit()
+    invalidate_market_snapshot()
+    yield app
+    invalidate_market_snapshot()
+
+
+def _post_batch(app, body):
+    return app.test_client().post("/api/markets/nearby/batch", json=body)
+
+
+@pytest.mark.parametrize("grid_min_markets", [0, nearby.GRID_MIN_MARKETS])
+def test_nearest_rows_match_brute_force(monkeypatch, grid_min_markets):
+    monkeypatch.setattr(nearby, "GRID_MIN_MARKETS", grid_min_markets)
+    monkeypatch.setattr(Config, "GRID_CELL_DEGREES", 0.2)
+    rng = random.Random(3)
+    snapshot = MarketSnapshot.from_rows(
+        (i + 1, -6.2 + rng.uniform(-1, 1), 106.8 + rng.uniform(-1, 1), "umum")
+        for i in range(150)
+    )
+    origins = [
+        (-6.2 + rng.uniform(-1, 1), 106.8 + rng.uniform(-1, 1)) for _ in range(20)
+    ]
+
+    rows, distances = nearest_rows(snapshot, origins, 4)
+    assert rows.shape == distances.shape == (20, 4)
+    for (lat, lng), got_rows, got_distances in zip(origins, rows, distances):
+        expected = sorted(
+            (
+                haversine_km(
+                    lat, lng, snapshot.latitudes[row], snapshot.longitudes[row]
+                ),
+                row,
+            )
+            for row in range(len(snapshot))
+        )[:4]
+        assert list(got_rows) == [row for _, row in expected]
+        assert list(got_distances) == pytest.approx([d for d, _ in expected])
+
+
+@pytest.mark.parametrize("grid_min_markets", [0, nearby.GRID_MIN_MARKETS])
+def test_nearest_rows_with_fewer_markets_than_limit(monkeypatch, grid_min_markets):
+    monkeypatch.setattr(nearby, "GRID_MIN_MARKETS", grid_min_markets)
+    snapshot = MarketSnapshot.from_rows([(1, 0.0, 0.2, None), (2, 0.0, 0.1, None)])
+    rows, distances = nearest_rows(snapshot, [(0.0, 0.0)], 5)
+    assert list(rows[0]) == [1, 0]
+    assert distances[0][0] < distances[0][1]
+
+
+def test_batch_streams_one_line_per_origin_in_input_order(app):
+    origins = [
+        {"id": "far", "latitude": -6.2, "longitude": 110.9},
+        {"latitude": -6.2, "longitude": 106.8},
+    ]
+    response = _post_batch(app, {"origins": origins, "limit": 2})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+
+    body = response.get_data(as_text=True)
+    assert body.endswith("\n")
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1]
+    assert lines[0]["id"] == "far" and "id" not in lines[1]
+    assert [m["name"] for m in lines[0]["markets"]] == ["Pasar 4", "Pasar 3"]
+    assert [m["name"] for m in lines[1]["markets"]] == ["Pasar 0", "Pasar 1"]
+    assert lines[1]["markets"][0]["distance_km"] == 0.0
+
+
+def test_batch_rejects_invalid_origins_and_oversized_batches(app):
+    response = _post_batch(
+        app,
+        {"origins": [{"latitude": -6.2, "longitude": 106.8}, {"latitude": 91}, 5]},
+    )
+    assert response.status_code == 422
+    errors = response.get_json()["error"]["details"]["validation_errors"]
+    assert set(errors) == {"1", "2"}
+    assert errors["2"] == ["Origin must be an object"]
+
+    app.config["NEARBY_BATCH_MAX_ORIGINS"] = 1
+    origin = {"latitude": -6.2, "longitude": 106.8}
+    assert _post_batch(app, {"origins": [origin, origin]}).status_code == 400
+    assert _post_batch(app, {"origins": [origin], "limit": 51}).status_code == 400
+
+
+def test_batch_reports_errors_mid_stream(app, monkeypatch):
+    monkeypatch.setattr(nearby, "MAX_BATCH_CELLS", 1)  # one origin per chunk
+    get_markets_by_ids = MarketService.get_markets_by_ids
+    calls = []
+
+    def failing_after_first_chunk(market_ids):
+        calls.append(market_ids)
+        if len(calls) > 1:
+            raise RuntimeError("database went away")
+        return get_markets_by_ids(market_ids)
+
+    monkeypatch.setattr(MarketService, "get_markets_by_ids", failing_after_first_chunk)
+    origins = [{"latitude": -6.2, "longitude": 106.8 + i} for i in range(3)]
+    response = _post_batch(app, {"origins": origins, "limit": 1})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0]["index"] == 0
+    assert lines[-1] == {"error": "Failed to find nearby markets"}
+    assert len(lines) == 2
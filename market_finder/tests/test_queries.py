@@ -0,0 +1,74 @@
+"""
+Query-count regression tests for market list and search endpoints
+"""
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db
+from app.models.market import Market, MarketImage
+from app.services.grid import market_grid
+
+REQUESTS = [
+    ("get", "/api/markets/?per_page=100", None),
+    ("get", "/api/markets/search?q=Pasar&per_page=100", None),
+    (
+        "get",
+        "/api/markets/search/location?latitude=-6.2&longitude=106.8&radius=50",
+        None,
+    ),
+    ("post", "/api/markets/nearby", {"latitude": -6.2, "longitude": 106.8}),
+]
+
+
+def _add_markets(count):
+    for i in range(count):
+        latitude, longitude = -6.2 + i * 0.001, 106.8 + i * 0.001
+        market = Market(
+            name=f"Pasar {i}",
+            location="Jakarta",
+            latitude=latitude,
+            longitude=longitude,
+            grid_cell=market_grid().cell(latitude, longitude),
+        )
+        market.images = [
+            MarketImage(
+                filename=f"{i}-{n}.jpg",
+                original_filename=f"{n}.jpg",
+                file_path=f"uploads/{i}-{n}.jpg",
+            )
+            for n in range(2)
+        ]
+        db.session.add(market)
+    db.session.commit()
+
+
+def _image_selects(app, method, url, body):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = app.test_client()
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        response = getattr(client, method)(url, json=body)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    assert response.status_code == 200, response.get_json()
+    markets = response.get_json()["data"]
+    assert markets and all(len(market["images"]) == 2 for market in markets)
+    return sum("FROM market_images" in statement for statement in statements)
+
+
+@pytest.mark.parametrize("method, url, body", REQUESTS)
+def test_market_images_are_loaded_in_one_query(app, method, url, body):
+    _add_markets(30)
+    db.session.expunge_all()  # Nothing loaded before the request
+    assert _image_selects(app, method, url, body) == 1
@@ -0,0 +1,288 @@
+"""
+Tests for OSRM route distance integration, run against a local stub server
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.route_cache import RouteDistanceCache
+from app.services.route_store import RouteDistanceStore
+from app.services.routing import (
+    OSRM_MAX_TABLE_DESTINATIONS,
+    CircuitBreaker,
+    DisabledBreaker,
+    MatrixRoutingProvider,
+    OSRMClient,
+    RoutingProvider,
+    build_distance_matrix,
+)
+
+
+class StubOSRM:
+    """Local OSRM stand-in; distance to a point is its longitude in km"""
+
+    def __init__(self):
+        self.delays = {}  # destination longitude -> seconds
+        self.table_requests = 0
+        self.route_requests = 0
+        self.table_fails = False
+        self.route_fails = False
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                coords = self.path.split("/")[-1].split("?")[0].split(";")
+                if self.path.startswith("/table/"):
+                    return self._table(coords)
+                stub.route_requests += 1
+                if stub.route_fails:
+                    return self._reply({"code": "NoRoute"}, status=400)
+                destination_lng = float(coords[-1].split(",")[0])
+
+                with stub.lock:
+                    stub.active += 1
+                    stub.peak = max(stub.peak, stub.active)
+                time.sleep(stub.delays.get(destination_lng, 0.2))
+                with stub.lock:
+                    stub.active -= 1
+
+                self._reply(
+                    {"code": "Ok", "routes": [{"distance": destination_lng * 1000}]}
+                )
+
+            def _table(self, coords):
+                stub.table_requests += 1
+                if stub.table_fails:
+                    return self._reply({"code": "TooBig"}, status=400)
+                longitudes = [float(coord.split(",")[0]) for coord in coords[1:]]
+                row = [None if lng < 0 else lng * 1000 for lng in longitudes]
+                self._reply({"code": "Ok", "distances": [row]})
+
+            def _reply(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_osrm():
+    stub = StubOSRM()
+    yield stub
+    stub.close()
+
+
+def test_route_distances_run_concurrently(stub_osrm):
+    client = OSRMClient(stub_osrm.url, timeout=2, max_concurrency=4, deadline=5)
+    destinations = [(0.0, float(lng)) for lng in range(1, 9)]
+
+    started = time.monotonic()
+    distances = client.route_distances((0.0, 0.0), destinations)
+    elapsed = time.monotonic() - started
+    client.close()
+
+    assert distances == [float(lng) for lng in range(1, 9)]
+    assert stub_osrm.peak == 4  # bounded by max_concurrency
+    assert elapsed < 8 * 0.2  # faster than serial lookups
+
+
+def test_routes_missing_the_deadline_return_none(stub_osrm):
+    stub_osrm.delays[3.0] = 1.5
+    client = OSRMClient(stub_osrm.url, timeout=2, max_concurrency=4, deadline=0.6)
+
+    distances = client.route_distances((0.0, 0.0), [(0.0, 1.0), (0.0, 2.0), (0.0, 3.0)])
+    client.close()
+
+    assert distances == [1.0, 2.0, None]
+
+
+def test_table_mode_uses_single_request(stub_osrm):
+    client = OSRMClient(stub_osrm.url, ranking_mode="table")
+    destinations = [(0.0, 1.5), (0.0, -1.0), (0.0, 4.0)]
+
+    distances = client.ranking_distances((0.0, 0.0), destinations)
+    client.close()
+
+    assert distances == [1.5, None, 4.0]  # unreachable destination is None
+    assert stub_osrm.table_requests == 1
+    assert stub_osrm.route_requests == 0
+
+
+def test_table_failure_falls_back_to_route_mode(stub_osrm):
+    stub_osrm.table_fails = True
+    client = OSRMClient(stub_osrm.url, ranking_mode="table")
+
+    distances = client.ranking_distances((0.0, 0.0), [(0.0, 1.0), (0.0, 2.0)])
+    client.close()
+
+    assert distances == [1.0, 2.0]
+    assert stub_osrm.table_requests == 1
+    assert stub_osrm.route_requests == 2
+
+
+def test_route_cache_quantizes_evicts_and_invalidates(monkeypatch):
+    cache = RouteDistanceCache(precision=3, ttl=60, maxsize=2)
+
+    cache.set((-6.20881, 106.84561), 1, 4.2)
+    assert cache.get((-6.20879, 106.84559), 1) == 4.2  # same ~110m cell
+    assert cache.get((-6.2188, 106.8456), 1) is None  # neighbouring cell
+
+    cache.set((-6.2088, 106.8456), 2, 1.0)
+    cache.set((-6.2088, 106.8456), 3, 2.0)  # evicts least recently used (1)
+    assert cache.get((-6.2088, 106.8456), 1) is None
+
+    cache.invalidate_market(2)
+    assert cache.get((-6.2088, 106.8456), 2) is None
+
+    now = time.monotonic()
+    monkeypatch.setattr("app.services.route_cache.time.monotonic", lambda: now + 61)
+    assert cache.get((-6.2088, 106.8456), 3) is None  # expired
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["evictions"], stats["expirations"]) == (1, 1, 1)
+    assert stats["invalidations"] == 1
+
+
+def test_route_store_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "route_distances.sqlite3")
+    writer = RouteDistanceStore(path)
+    writer.set_many((-6.209, 106.846), {1: 4.2, 2: 7.5})
+
+    reader = RouteDistanceStore(path)  # e.g. another worker or after restart
+    assert reader.get_many((-6.209, 106.846), [1, 2, 3]) == {1: 4.2, 2: 7.5}
+
+    reader.invalidate_market(1)
+    assert writer.get_many((-6.209, 106.846), [1, 2]) == {2: 7.5}
+
+
+def test_circuit_breaker_opens_and_probes_half_open(stub_osrm):
+    stub_osrm.table_fails = stub_osrm.route_fails = True
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.3, latency_budget=1)
+    client = OSRMClient(stub_osrm.url, ranking_mode="table", breaker=breaker)
+
+    # Table and route requests fail until the breaker opens
+    client.ranking_distances((0.0, 0.0), [(0.0, -1.0)])
+    assert breaker.snapshot()["state"] == CircuitBreaker.OPEN
+    requests_when_opened = stub_osrm.table_requests + stub_osrm.route_requests
+
+    # While open, OSRM is not contacted at all
+    assert client.ranking_distances((0.0, 0.0), [(0.0, 1.0)]) == [None]
+    assert stub_osrm.table_requests + stub_osrm.route_requests == requests_when_opened
+
+    # After the cool-down a successful probe closes the breaker
+    time.sleep(0.35)
+    stub_osrm.table_fails = stub_osrm.route_fails = False
+    assert client.ranking_distances((0.0, 0.0), [(0.0, 2.0)]) == [2.0]
+    assert breaker.snapshot()["state"] == CircuitBreaker.CLOSED
+    client.close()
+
+
+def test_matrix_provider_serves_precomputed_distances(tmp_path):
+    class FakeTableClient:
+        def table_distances(self, origin, destinations):
+            # Distance is the longitude gap, unknown for negative longitudes
+            return [
+                None if lng < 0 else abs(lng - origin[1]) for _, lng in destinations
+            ]
+
+    markets = [
+        SimpleNamespace(id=10, latitude=0.0, longitude=1.0),
+        SimpleNamespace(id=20, latitude=0.5, longitude=2.0),
+        SimpleNamespace(id=30, latitude=0.2, longitude=-0.5),
+    ]
+    path = str(tmp_path / "route_matrix")
+    result = build_distance_matrix(
+        FakeTableClient(), markets, path, cell_size=0.5, chunk=2
+    )
+    assert result["failed_requests"] == 0
+    assert result["unknown_distances"] == result["cells"]  # market 30 everywhere
+
+    provider = MatrixRoutingProvider(path)
+    distances = provider.distances((0.1, 1.1), markets)
+    cell_lng = provider.lng_min + 0.25 + 0.5 * ((1.1 - provider.lng_min) // 0.5)
+    assert distances[0] == pytest.approx(abs(1.0 - cell_lng))
+    assert distances[1] == pytest.approx(abs(2.0 - cell_lng))
+    assert distances[2] is None
+
+    # Moved since the matrix was built, as seen by any worker
+    moved = SimpleNamespace(id=10, latitude=0.0, longitude=1.01)
+    assert provider.distances((0.1, 1.1), [moved, markets[1]]) == [
+        None,
+        distances[1],
+    ]
+    assert MatrixRoutingProvider(path).distances((0.1, 1.1), [moved]) == [None]
+    assert provider.distances((40.0, 1.1), markets) == [None, None, None]
+
+
+def test_matrix_build_retries_and_counts_failed_requests(tmp_path):
+    class FlakyTableClient:
+        def __init__(self, failures):
+            self.failures = failures
+            self.sizes = []
+
+        def table_distances(self, origin, destinations):
+            self.sizes.append(len(destinations))
+            if self.failures:
+                self.failures -= 1
+                return None
+            return [1.0] * len(destinations)
+
+    markets = [
+        SimpleNamespace(id=i, latitude=0.1, longitude=0.1 + i * 1e-4)
+        for i in range(150)
+    ]
+    path = str(tmp_path / "route_matrix")
+
+    client = FlakyTableClient(failures=2)
+    result = build_distance_matrix(client, markets, path, cell_size=1.0, backoff=0)
+    assert max(client.sizes) <= OSRM_MAX_TABLE_DESTINATIONS  # source + 99 <= 100
+    assert result["failed_requests"] == result["unknown_distances"] == 0
+
+    client = FlakyTableClient(failures=10**6)
+    result = build_distance_matrix(
+        client, markets, path, cell_size=1.0, retries=1, backoff=0
+    )
+    assert result["failed_requests"] == 2 * result["cells"]  # two chunks per cell
+    assert result["unknown_distances"] == 150 * result["cells"]
+    assert len(client.sizes) == 2 * result["failed_requests"]
+
+
+def test_matrix_client_bypasses_the_circuit_breaker(stub_osrm):
+    stub_osrm.table_fails = True
+    client = OSRMClient(stub_osrm.url, breaker=DisabledBreaker())
+    for _ in range(5):
+        assert client.table_distances((0.0, 0.0), [(0.0, 1.0)]) is None
+    stub_osrm.table_fails = False
+    assert client.table_distances((0.0, 0.0), [(0.0, 1.0)]) == [1.0]
+    client.close()
+
+
+def test_routing_provider_requires_distances():
+    with pytest.raises(TypeError):
+        RoutingProvider()
@@ -0,0 +1,57 @@
+"""
+Tests for the in-process market spatial index
+"""
+
+import math
+import os
+import random
+import sys
+
+# Add the parent directory to the path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.distance import haversine_km
+from app.services.spatial_index import MarketSpatialIndex
+
+
+def _make_rows(count, seed=3):
+    rng = random.Random(seed)
+    return [
+        (i + 1, -6.2 + rng.uniform(-1, 1), 106.8 + rng.uniform(-1, 1))
+        for i in range(count)
+    ]
+
+
+def _brute_force(rows, lat, lng):
+    return sorted((haversine_km(lat, lng, r[1], r[2]), r[0]) for r in rows)
+
+
+def test_nearest_matches_brute_force():
+    rows = _make_rows(1000)
+    index = MarketSpatialIndex()
+    index.rebuild(rows)
+
+    expected = _brute_force(rows, -6.2, 106.8)
+    nearest = index.nearest(-6.2, 106.8, 10)
+    assert [market_id for market_id, _ in nearest] == [m for _, m in expected[:10]]
+    for (_, distance), (expected_distance, _) in zip(nearest, expected):
+        assert math.isclose(distance, expected_distance, rel_tol=1e-6)
+
+
+def test_patches_are_visible_before_and_after_compaction():
+    rows = _make_rows(200)
+    index = MarketSpatialIndex()
+    index.rebuild(rows)
+
+    index.upsert(5000, -6.2, 106.8)  # new market exactly at the origin
+    index.upsert(1, -6.2001, 106.8001)  # moved next to the origin
+    index.remove(2)
+    nearest = index.nearest(-6.2, 106.8, 2)
+    assert [market_id for market_id, _ in nearest] == [5000, 1]
+    assert 2 not in [m for m, _ in index.nearest(-6.2, 106.8, len(rows))]
+
+    # Force compaction and re-check
+    for market_id in range(3, 120):
+        index.remove(market_id)
+    assert len(index) == 200 - 118 + 1
+    assert [m for m, _ in index.nearest(-6.2, 106.8, 2)] == [5000, 1]